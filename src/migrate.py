@@ -0,0 +1,24 @@
+import argparse
+from trustmanager import SQLiteStorage
+from trustmanager.snapshot import convert
+
+if __name__ == "__main__":
+
+    ### Storage Migration Tool
+    # Converts a storage file, the formats are selected by the file extensions:
+    #   scores.json -> scores.db   import into the SQLite storage engine (a scores.tms snapshot can be imported too)
+    #   scores.json -> scores.tms  convert to the binary snapshot format
+    #   scores.tms  -> scores.json convert back to the JSON format
+    parser = argparse.ArgumentParser(description="Convert Trust Manager storage files between the JSON, binary snapshot and SQLite formats")
+    parser.add_argument("source", help="Storage file to convert (e.g. scores.json or scores.tms)")
+    parser.add_argument("target", help="Target storage file (e.g. scores.db, scores.tms or scores.json)")
+    parser.add_argument("--reset", action="store_true", help="Truncate the SQLite storage before importing")
+    args = parser.parse_args()
+
+    if args.target.endswith(".db"):
+        storage = SQLiteStorage(args.target[:-len(".db")], args.reset)
+        count = storage.import_json(args.source)
+        storage.close()
+    else:
+        count = convert(args.source, args.target)
+    print(f"[Migration] Converted {count} items from {args.source} into {args.target}")
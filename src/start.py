@@ -1,15 +1,15 @@
-import time
+import json
+import asyncio
 import uvicorn
-import schedule
-import threading
 import configparser
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from trustmanager import TrustManager
-
-def run_calculation(stop_event):
-    while not stop_event.is_set():
-        schedule.run_pending()
-        time.sleep(1)
+from trustmanager.ingestion import IngestionQueue
+from trustmanager.scheduler import Scheduler
+from trustmanager.metrics import MetricsMiddleware, TRACKED_IES, INGESTION_DEPTH, OUTBOX_DEPTH
 
 if __name__ == "__main__":
     
@@ -20,7 +20,18 @@ if __name__ == "__main__":
     # General Parameters
     port = int(config["General"].getint("port")) or 3000
     storageName = config["General"].get("storageName") or "scores"
+    storageEngine = config["General"].get("storageEngine") or "json"
+    storageHistory = config["General"].get("storageHistory") == "yes"
+    storageFormat = config["General"].get("storageFormat") or "json"
     storageReset = config["General"].get("storageReset") == "yes"
+    storageJournal = config["General"].get("storageJournal") == "yes"
+    journalCompactSize = int(config["General"].getint("journalCompactSize", 1000)) or 1000
+    storageFlushInterval = float(config["General"].getfloat("storageFlushInterval", 0))
+    storageFlushWrites = int(config["General"].getint("storageFlushWrites", 0))
+    storageIndexes = [field.strip() for field in config["General"].get("storageIndexes", "").split(",") if field.strip()]
+    ingestionWorkers = int(config["General"].getint("ingestionWorkers", 4)) or 4
+    ingestionQueueSize = int(config["General"].getint("ingestionQueueSize", 1000)) or 1000
+    ingestionOverflow = config["General"].get("ingestionOverflow") or "reject"
     
     # Connections Parameters
     orion = config['Connections'].get('ngsild_cb_url')
@@ -28,6 +39,17 @@ if __name__ == "__main__":
     iota_api_url = config['Connections'].get('iota_api_url','')
     iota_node_url = config['Connections'].get('iota_node_ip','')
     log_file_port = config['Connections'].get('log_file_port')
+    notification_url = config['Connections'].get('notification_url', f'http://localhost:{port}/reliability/notification')
+    poolSize = int(config['Connections'].getint('poolSize', 10)) or 10
+    connectTimeout = float(config['Connections'].getfloat('connectTimeout', 3)) or 3
+    readTimeout = float(config['Connections'].getfloat('readTimeout', 10)) or 10
+    orionBatchSize = int(config['Connections'].getint('orionBatchSize', 100)) or 100
+    registryTTL = float(config['Connections'].getfloat('registryTTL', 60)) or 60
+    registryRefreshInterval = float(config['Connections'].getfloat('registryRefreshInterval', 0))
+    iotaOutbox = config['Connections'].get('iotaOutbox', 'yes') == "yes"
+    iotaBatchSize = int(config['Connections'].getint('iotaBatchSize', 1)) or 1
+    iotaPublishInterval = float(config['Connections'].getfloat('iotaPublishInterval', 1)) or 1
+    iotaMaxRetryDelay = float(config['Connections'].getfloat('iotaMaxRetryDelay', 60)) or 60
 
     # Trust Algorithm Parameters
     scoreInterval = float(config['TrustAlgorithm'].getfloat('scoreInterval')) or 5
@@ -36,37 +58,111 @@ if __name__ == "__main__":
     secWeight = float(config["TrustAlgorithm"].getfloat("SecurityWeight")) or 0.5
     repWeight = float(config["TrustAlgorithm"].getfloat("ReputationWeight")) or 0.25
     relInterval = float(config['TrustAlgorithm'].getfloat('reliabilityInterval')) or 5
+    relMode = config['TrustAlgorithm'].get('reliabilityMode') or "poll"
+    relResyncInterval = float(config['TrustAlgorithm'].getfloat('reliabilityResyncInterval', 24))
     repInterval = float(config['TrustAlgorithm'].getfloat('reputationInterval')) or 5
+    repRefreshInterval = float(config['TrustAlgorithm'].getfloat('reputationRefreshInterval', 60)) or 60
+    repHalfLife = float(config['TrustAlgorithm'].getfloat('reputationHalfLife', 0))
+    repConcurrency = int(config['TrustAlgorithm'].getint('reputationConcurrency', 20)) or 20
     priorityThreshold = float(config["TrustAlgorithm"].getfloat("priorityThreshold")) or 3
     notificationThreshold = float(config["TrustAlgorithm"].getfloat("notificationThreshold")) or 4
+    recomputeDebounce = float(config["TrustAlgorithm"].getfloat("recomputeDebounce", 10))
+    recomputeMinInterval = float(config["TrustAlgorithm"].getfloat("recomputeMinInterval", 2))
+    securityHalfLife = float(config["TrustAlgorithm"].getfloat("securityHalfLife", 24))
+    jobJitter = float(config["TrustAlgorithm"].getfloat("jobJitter", 0))
+    jobCatchUp = config["TrustAlgorithm"].get("jobCatchUp") or "skip"
     
     # Sub-Scores Calculation Parameters
     relParams = dict(config["ReliabilityScore"].items())
     secParams = dict(config["SecurityScore"].items())
     repParams = dict(config["ReputationScore"].items())
+    # Attribute names as written in the configuration (configparser lowercases option names)
+    rawConfig = configparser.ConfigParser()
+    rawConfig.optionxform = str
+    rawConfig.read('configs/manager.ini')
+    relAttributes = list(rawConfig["ReliabilityScore"].keys())
     
     # Trust Manager Initialization
     manager = TrustManager(
         dict({
+            "engine": storageEngine,
             "name": storageName,
-            "reset": storageReset
+            "history": storageHistory,
+            "format": storageFormat,
+            "reset": storageReset,
+            "journal": storageJournal,
+            "compactSize": journalCompactSize,
+            "flushInterval": storageFlushInterval,
+            "flushWrites": storageFlushWrites,
+            "indexes": storageIndexes
         }),
         dict({
             "healthPenalty":healthPenalty,
+            "reputationConcurrency":repConcurrency,
+            "securityHalfLife":securityHalfLife * 3600,
+            "recomputeDebounce":recomputeDebounce,
+            "recomputeMinInterval":recomputeMinInterval,
+            "reputationHalfLife":repHalfLife * 86400,
             "weights":{
                 "reliability":relWeight,   
                 "security":secWeight,   
                 "reputation":repWeight   
             },
+            "attributes":{
+                "reliability":relAttributes
+            },
             "params":{
                 "reliability":relParams, 
                 "security":secParams,
-                "reputation":relParams
+                "reputation":repParams
             }
+        }),
+        dict({
+            "poolSize": poolSize,
+            "connectTimeout": connectTimeout,
+            "readTimeout": readTimeout,
+            "orionBatchSize": orionBatchSize,
+            "registryTTL": registryTTL,
+            "registryRefreshInterval": registryRefreshInterval,
+            "iotaOutbox": iotaOutbox,
+            "iotaBatchSize": iotaBatchSize,
+            "iotaPublishInterval": iotaPublishInterval,
+            "iotaMaxRetryDelay": iotaMaxRetryDelay
         }))
     
+    ingestion = IngestionQueue(ingestionWorkers, ingestionQueueSize, ingestionOverflow)
+    scheduler = Scheduler()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        ingestion.start()
+        if manager.outbox is not None:
+            manager.outbox.start()
+        manager.ie_registry(orion).start()
+        if manager.coordinator is not None:
+            manager.coordinator.start()
+        if relMode == "subscription":
+            await asyncio.to_thread(manager.subscribe_reliability, orion, notification_url)
+        await scheduler.start()
+        yield
+        # Stop the jobs, apply queued events, then flush deferred storage writes (pending IOTA messages stay in the outbox file)
+        await scheduler.stop()
+        manager.ie_registry(orion).stop()
+        if relMode == "subscription":
+            await asyncio.to_thread(manager.unsubscribe_reliability, orion)
+        ingestion.stop()
+        if manager.coordinator is not None:
+            manager.coordinator.stop()
+        if manager.outbox is not None:
+            manager.outbox.stop()
+        manager.storage.close()
+        manager.http.close()
+        manager.async_http.close()
+
     # Server Initialization
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
+    # Request latency of the event and calculation endpoints (plain ASGI middleware, other paths are not timed)
+    app.add_middleware(MetricsMiddleware, paths=["/notification", "/health", "/calculate", "/calculate/batch"])
 
     # Server APIs Setup
     ### Trust Algorithm APIs
@@ -83,10 +179,34 @@ if __name__ == "__main__":
         except Exception as e:
             return {"error": str(e)}
         
+    @app.post('/calculate/batch')
+    async def topsis_batch_calculation(request:Request):
+        args = await request.json()
+        problems = args["problems"] if isinstance(args, dict) and "problems" in args else args
+        if not isinstance(problems, list):
+            return JSONResponse({"error": "Invalid Arguments Provided"}, status_code=400)
+        results = manager.trust.calculate_topsis_batch(problems)
+
+        # One JSON line per problem, in input order
+        def lines():
+            for index, result in enumerate(results):
+                if isinstance(result, (KeyError, TypeError)):
+                    line = {"index": index, "error": "Invalid Arguments Provided"}
+                elif isinstance(result, Exception):
+                    line = {"index": index, "error": str(result)}
+                else:
+                    line = {"index": index, "rankings": result[0].tolist(), "scores": result[1].tolist()}
+                yield json.dumps(line) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
     @app.get('/weights')
     def get_weights():
         return manager.weights
 
+    @app.get('/outbox')
+    def get_outbox():
+        return manager.outbox.stats() if manager.outbox is not None else {"error": "IOTA outbox disabled"}
+
     ## Reliability Score (Interval) [0, 1] - Normalization Check
     ## Security Score (Real Time) [1, 5] -*-> [0, 1] normalization (?)
     ## Reputation Score (Interval) [1, 5] -*-> [0, 1] normalization  (?)
@@ -103,101 +223,101 @@ if __name__ == "__main__":
     # FIXME: Trust Calculcation Trigger #1: Interval of X minutes (reset notifications)
     ## Manager Trust Score Job <= TRUST SCORE INTERVAL
    
-    schedule.every(scoreInterval).minutes.do(manager.update_trust_scores,orion=orion, iota=iota_api_url, node=iota_node_url)
+    scheduler.add_job("trust", manager.update_trust_scores, scoreInterval * 60, jobJitter, jobCatchUp, orion=orion, iota=iota_api_url, node=iota_node_url)
     
+    def valid_event(data, fields):
+        # Every event must hold the fields with the expected types (bool is not accepted as a number)
+        events = data if isinstance(data, list) else [data]
+        return len(events) > 0 and all(isinstance(event, dict) and all(
+            isinstance(event.get(field), types) and not isinstance(event.get(field), bool) for field, types in fields.items()) for event in events)
+
+    def queue_event(kind, data):
+        if not ingestion.submit(kind, data):
+            return JSONResponse({"error": "Ingestion queue full"}, status_code=503, headers={"Retry-After": "1"})
+        return JSONResponse({"status": "accepted", "queued": ingestion.queue.qsize()}, status_code=202)
+
+    # Events are validated and queued, the ingestion workers update the scores (storage, Orion and IOTA calls stay off the event loop)
+    ingestion.register("notification", lambda data: manager.handle_notification(
+        data, domain, orion, iota_api_url, iota_node_url, notificationThreshold, priorityThreshold))
+    ingestion.register("health", lambda data: manager.handle_health(data, domain, orion, iota_api_url, iota_node_url))
+
     @app.put('/notification')
     async def handle_notification(request:Request):
         data = await request.json()
-        print(data)
-        id = ""
-        if isinstance(data, list):
-            #id = data[0]["node_name"]
-            id= domain + ":" + data[0]["mac"].replace(":", "")
-        elif isinstance(data, dict):
-            #id = data["node_name"]
-            id = domain + ":" + data["mac"].replace(":", "")
-        
-        secScore = manager.calculate_security_score(data,domain)
-        print("secScore:", secScore)
-        #id = "MyDomain:fa163e32c6ee"
-        print("notification id: ",id)
         # FIXME: Trust Calculcation Trigger: Number of notification requests done in X minutes (reset notifications, reset calculation interval)
-        if id:
-            storage = manager.storage.read_item(id)
-            if storage["notifications"] > notificationThreshold:
-                manager.update_trust_score(id,orion,iota_api_url,iota_node_url)
-            # FIXME: Trust Calculcation Trigger: Events with priority Y+ in the X minutes (reset calculation interval)
-            #max_priority = max(data, key=lambda x: x["priority"])
-            #elif isinstance(data, dict):
-            max_priority = data["priority"]
-            #if max_priority["priority"] > priorityThreshold:
-            if max_priority >= priorityThreshold:
-                manager.update_trust_score(id,orion,iota_api_url,iota_node_url)  
-        return secScore
+        if not valid_event(data, {"mac": str, "priority": (int, float)}):
+            return JSONResponse({"error": "Invalid Arguments Provided"}, status_code=400)
+        return queue_event("notification", data)
     
     ## NOTICE: Register Health Events (Bad News) received in this API 
     # TODO: Reset events weekly, these will refer to bad events happening the last week -> Whenever we calculate the reputation score, these should be reset 
-    # TODO: Ask partners for the payload of the API, we expect the ID of the IE for each health event pushed here
     @app.post('/health')
     # Node -> /health ==> Bad thing happened, keep track of the event and how many events have been posted to this API
     async def handle_health(request:Request):
-         data =  await request.json()
-         print("test")
-         print(data)
-         #if list count and save to storage
-         if isinstance(data, list):
-            #id = data[0]["node_name"]
-            id = domain + ":" + data[0]["mac_address"].replace(":", "")
-            #storage = manager.storage.read_item(data[0]["node_name"])
-            storage = manager.storage.read_item(id)
-            print(storage)
-            alertsNumber = len(data)
-            if "health_events" not in storage:
-                storage["health_events"] = 0  # Initialize if missing
-            manager.storage.write_item({"health_events":storage["health_events"]+alertsNumber},id)
-         # If jsonobject
-         elif isinstance(data, dict):
-            #id = data["node_name"]
-            id = domain + ":" + data["mac_address"].replace(":", "")
-            storage = manager.storage.read_item(id)
-            print(storage)
-            if "health_events" not in storage:
-                storage["health_events"] = 0  # Initialize if missing
-            manager.storage.write_item({"health_events":storage["health_events"]+1},id)
-            ##for mvp2
-            manager.update_trust_score(id,orion,iota_api_url,iota_node_url)
-         else:
-            print("Unknown JSON type")
-         #storage = manager.storage.read_item(data["id"])
-         #manager.storage.write_item({"health_events":storage["health_events"]+1},data["id"])
-         return "Health event registered!"
+        data = await request.json()
+        if not valid_event(data, {"mac_address": str}):
+            return JSONResponse({"error": "Invalid Arguments Provided"}, status_code=400)
+        return queue_event("health", data)
+
+    ## NOTICE: NGSI-LD notifications of the reliability attributes subscription (reliabilityMode = subscription)
+    @app.post('/reliability/notification')
+    async def handle_reliability_notification(request:Request):
+        data = await request.json()
+        if not isinstance(data, dict) or not isinstance(data.get("data"), list):
+            return JSONResponse({"error": "Invalid Arguments Provided"}, status_code=400)
+        # Applied before answering (off the event loop), not queued with the security and health events: Orion does not
+        # redeliver notifications, so a full or overflowing queue would leave the reliability scores stale until the resync
+        await asyncio.to_thread(manager.handle_reliability_notification, data)
+        return JSONResponse({"status": "applied"}, status_code=200)
+
+    @app.get('/ingestion')
+    def get_ingestion():
+        return ingestion.stats()
+
+    @app.get('/recompute')
+    def get_recompute():
+        return manager.coordinator.stats() if manager.coordinator is not None else {"error": "Recompute coordinator disabled"}
+
+    @app.get('/registry')
+    def get_registry():
+        return manager.ie_registry(orion).stats()
+
+    @app.get('/jobs')
+    def get_jobs():
+        return scheduler.report()
+
+    # Gauges read when scraped, so nothing is added to the request path
+    TRACKED_IES.set_function(lambda: len(manager.ie_registry(orion).entities))
+    INGESTION_DEPTH.set_function(ingestion.queue.qsize)
+    if manager.outbox is not None:
+        OUTBOX_DEPTH.set_function(lambda: manager.outbox.stats()["depth"])
+
+    @app.get('/metrics')
+    def get_metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
       
     ## Manager Reliability Score Job (done)
     
-    schedule.every(relInterval).minutes.do(manager.calculate_reliability_scores,orion=orion)
+    # First reliability calculation as soon as the server starts. In subscription mode Orion notifies the changes and
+    # the full query only resyncs every reliabilityResyncInterval hours (0 = never)
+    if relMode == "subscription":
+        scheduler.add_job("reliability", manager.calculate_reliability_scores, relResyncInterval * 3600, jobJitter, jobCatchUp, run_at_start=True, orion=orion)
+    else:
+        scheduler.add_job("reliability", manager.calculate_reliability_scores, relInterval * 60, jobJitter, jobCatchUp, run_at_start=True, orion=orion)
    
 
-    #manager.calculate_reliability_scores(orion)
     ## Manager Reputation Score Job 
     ## TODO: Ask partners for the log file API to use (Method, URL, Payload)
    
-    schedule.every(repInterval).days.do(manager.calculate_reputation_scores,orion=orion, port=log_file_port)
-    manager.calculate_reliability_scores(orion)
+    # Incremental pulls of the new self-security events; health events are reset on their own (weekly) schedule
+    scheduler.add_job("reputation", manager.calculate_reputation_scores, repRefreshInterval * 60, jobJitter, jobCatchUp, orion=orion, port=log_file_port)
+    scheduler.add_job("health_reset", manager.reset_health_events, repInterval * 86400, jobJitter, jobCatchUp)
     #manager.calculate_reputation_scores(orion,log_file_port)
     #manager.init_security_score(orion)
     #manager.update_trust_scores(orion,iota_api_url,iota_node_url)
     #print(f"self security port: {log_file_port}")
-    stop_event = threading.Event()
-    scheduler_thread = threading.Thread(target=run_calculation, args=(stop_event,))
-    scheduler_thread.daemon = True
-    scheduler_thread.start()
 
     
     ## Start Trust Manager Server 
-    try:
-        print(f"Starting Trust Manager on http://localhost:{port}")
-        uvicorn.run(app, host="0.0.0.0", port=port)
-        #manager.calculate_reputation_scores(orion,log_file_port)
-    except KeyboardInterrupt:
-        stop_event.set()#
-        scheduler_thread.join()
+    print(f"Starting Trust Manager on http://localhost:{port}")
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -1,3 +1,4 @@
 from trustmanager.main import TrustManager
 from trustmanager.algorithm import TrustAlgorithm
-from trustmanager.storage import LocalStorage
\ No newline at end of file
+from trustmanager.storage import LocalStorage
+from trustmanager.sqlite import SQLiteStorage
\ No newline at end of file
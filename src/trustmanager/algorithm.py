@@ -1,3 +1,4 @@
+import bisect
 import numpy as np
 
 class TrustAlgorithm:
@@ -6,51 +7,128 @@ class TrustAlgorithm:
      Provides functionalities for calculating the Trust Score.
     """
 
-    def topsis(self,decision_matrix, weights, impacts):
+    def impact_mask(self, impacts):
+        """
+        Convert criteria impacts to a boolean mask.
+
+        :param `impacts` (list): The impact of each criterion ('+' or '-'), or a boolean mask (True for '+')
+        :return `positive` (numpy array): True where a criterion has a positive impact
+        """
+        impacts = np.asarray(impacts)
+        if impacts.dtype == bool:
+            return impacts
+        positive = impacts == '+'
+        if not (positive | (impacts == '-')).all():
+            raise ValueError("Impact must be either '+' or '-'.")
+        return positive
+
+    def topsis(self,decision_matrix, weights, impacts, dtype=np.float64):
         """
         Perform TOPSIS method for multi-criteria decision making.
+
+        The decision matrix is solved as a batch of one problem by `topsis_batch`, which holds the algorithm.
         
         Parameters:
         decision_matrix (numpy array): The decision matrix (alternatives x criteria)
         weights (list): The weights for each criterion
-        impacts (list): The impact of each criterion ('positive' or 'negative')
+        impacts (list): The impact of each criterion ('+' or '-'), or a boolean mask (True for '+')
+        dtype (numpy dtype): Computation precision, float64 or float32 (faster, less memory)
         
         Returns:
         rankings (numpy array): The ranking of alternatives
         relative_closeness (numpy array): The relative closeness to the ideal solution
         """
-        # Step 1: Normalize the decision matrix
-        norm_matrix = decision_matrix / np.sqrt((decision_matrix**2).sum(axis=0))
-        
-        # Step 2: Apply the weights to the normalized decision matrix
-        weighted_matrix = norm_matrix * weights
-        
+        positive = self.impact_mask(impacts)
+        rankings, relative_closeness = self.topsis_batch(np.asarray(decision_matrix)[None], np.asarray(weights)[None], positive[None], dtype)
+        return rankings[0], relative_closeness[0]
+
+    def topsis_batch(self, decision_matrices, weights, positive, dtype=np.float64):
+        """
+        ### Batched TOPSIS
+
+        Perform TOPSIS on many decision matrices of the same shape at once. The decision matrices are copied once into a
+        work buffer that is normalized and weighted in place; a second buffer of the same shape holds the squared
+        differences to the ideal and negative-ideal solutions. Columns whose values are all zero have no influence on the
+        result.
+
+        :param `decision_matrices` (numpy array): Decision matrices (problems x alternatives x criteria)
+        :param `weights` (numpy array): Weights of each problem's criteria (problems x criteria)
+        :param `positive` (numpy array): True where a criterion has a positive impact (problems x criteria)
+        :param `dtype` (numpy dtype): Computation precision, float64 or float32
+        :return `rankings` (numpy array): Ranking of the alternatives of each problem (problems x alternatives)
+        :return `relative_closeness` (numpy array): Relative closeness to the ideal solution (problems x alternatives)
+        """
+        work = np.array(decision_matrices, dtype=dtype)
+        difference = np.empty_like(work)
+
+        # Step 1-2: Normalize and weight the decision matrices (zero-norm columns stay zero)
+        norms = np.sqrt(np.einsum('bij,bij->bj', work, work))
+        norms[norms == 0] = 1
+        work *= (np.asarray(weights, dtype=dtype) / norms)[:, None, :]
+
         # Step 3: Determine the ideal and negative-ideal solutions
-        ideal_solution = np.zeros(weighted_matrix.shape[1])
-        negative_ideal_solution = np.zeros(weighted_matrix.shape[1])
-        
-        for i in range(weighted_matrix.shape[1]):
-            if impacts[i] == '+':
-                ideal_solution[i] = np.max(weighted_matrix[:, i])
-                negative_ideal_solution[i] = np.min(weighted_matrix[:, i])
-            elif impacts[i] == '-':
-                ideal_solution[i] = np.min(weighted_matrix[:, i])
-                negative_ideal_solution[i] = np.max(weighted_matrix[:, i])
-            else:
-                raise ValueError("Impact must be either '+' or '-'.")
-        
+        maximum = work.max(axis=1)
+        minimum = work.min(axis=1)
+        ideal_solutions = np.where(positive, maximum, minimum)[:, None, :]
+        negative_ideal_solutions = np.where(positive, minimum, maximum)[:, None, :]
+
         # Step 4: Calculate the distance to the ideal and negative-ideal solutions
-        distance_to_ideal = np.sqrt(((weighted_matrix - ideal_solution)**2).sum(axis=1))
-        distance_to_negative_ideal = np.sqrt(((weighted_matrix - negative_ideal_solution)**2).sum(axis=1))
-        
+        np.subtract(work, ideal_solutions, out=difference)
+        distance_to_ideal = np.sqrt(np.einsum('bij,bij->bi', difference, difference))
+        np.subtract(work, negative_ideal_solutions, out=difference)
+        distance_to_negative_ideal = np.sqrt(np.einsum('bij,bij->bi', difference, difference))
+
         # Step 5: Calculate the relative closeness to the ideal solution
-        relative_closeness = distance_to_negative_ideal / (distance_to_ideal + distance_to_negative_ideal)
-        
+        distance_to_ideal += distance_to_negative_ideal
+        relative_closeness = np.divide(distance_to_negative_ideal, distance_to_ideal, out=distance_to_negative_ideal)
+
         # Step 6: Rank the alternatives
-        rankings = np.argsort(-relative_closeness) + 1
-        
+        rankings = np.argsort(-relative_closeness, axis=1) + 1
         return rankings, relative_closeness
 
+    def validate_weights(self, weights):
+        """
+        Validate the weights of a TOPSIS problem and convert them to arrays.
+
+        :param `weights` (dict): Weight values and impacts for decision
+        :return `weights`, `positive` (numpy arrays): Weight values and positive impact mask
+        """
+        # Weight Values & Impacts Check
+        impacts = np.array([weights[x]["impact"] for x in weights], dtype=object)
+        positive = impacts == "+"
+        invalid = ~(positive | (impacts == "-"))
+        if invalid.any():
+            w = list(weights)[int(np.argmax(invalid))]
+            raise Exception("Invalid impact value at",w,weights[w])
+        weightValues = np.array([float(weights[x]["weight"]) for x in weights])
+
+        # Weight Sum Check (with a floating-point tolerance, so acceptance does not depend on the summation order)
+        if not np.isclose(weightValues.sum(), 1):
+            raise Exception("Weight must sum to 1")
+        return weightValues, positive
+
+    def __prepare(self, alternatives, weights):
+        """
+        Validate a TOPSIS problem and convert it to arrays.
+
+        :param `alternatives` (list): Alternative decision values
+        :param `weights` (dict): Weight values and impacts for decision
+        :return `decision_matrix`, `weights`, `positive` (numpy arrays): Decision matrix, weight values and positive impact mask
+        """
+        # Alternatives Array Check
+        if len(alternatives) == 0:
+            raise Exception("Alternatives tables cannot be empty")
+        weightValues, positive = self.validate_weights(weights)
+
+        # Length Check
+        try:
+            decision_matrix = np.array(alternatives, dtype=float)
+        except ValueError:
+            raise Exception("Invalid length for alternatives and weights")
+        if decision_matrix.ndim != 2 or decision_matrix.shape[1] != len(weights):
+            raise Exception("Invalid length for alternatives and weights")
+        return decision_matrix, weightValues, positive
+
     def calculate_topsis(self, alternatives, weights={}):
         """
         ### Calculate TOPSIS Scores
@@ -61,31 +139,56 @@ class TrustAlgorithm:
         :param `weights` (dict): Weight values for decision
         :return `ranks` (arr): Ranking scores for alternatives
         """
-        # Alternatives Array Check
-        if len(alternatives) == 0:
-            raise Exception("Alternatives tables cannot be empty")
+        decision_matrix, weightValues, positive = self.__prepare(alternatives, weights)
 
-        # Weight Values & Impacts Check
-        weightSum = 0
-        for w in weights.keys():
-            if weights[w]["impact"] != "+" and weights[w]["impact"] != "-":
-                raise Exception("Invalid impact value at",w,weights[w])
-            weightSum += float(weights[w]["weight"])
-        
-        # Weight Sum & Length Check
-        if weightSum != 1 :
-            raise Exception("Weight must sum to 1")
-        for x in alternatives:
-            if len(x) != len(weights):
-                raise Exception("Invalid length for alternatives and weights")
+        # Perform TOPSIS evaluation
+        return self.topsis(decision_matrix, weightValues, positive)
 
-        # Extract Weight Values & Impacts
-        weightValues = [float(weights[x]["weight"]) for x in weights]
-        weightImpacts = [weights[x]["impact"] for x in weights]
+    def calculate_topsis_batch(self, problems):
+        """
+        ### Calculate Batched TOPSIS Scores
 
-        # Perform TOPSIS evaluation
-        return self.topsis(np.array(alternatives),weightValues, weightImpacts)
+        Calculate the topsis scores of many problems. Problems with the same shape are stacked and solved together by
+        `topsis_batch`.
+        
+        :param `problems` (list): Problems with `alternatives` and optional `weights`, as for `calculate_topsis`
+        :return `results` (list): `(rankings, scores)` or the raised exception of each problem, in input order
+        """
+        results = [None] * len(problems)
+        groups = {}
+        for i, problem in enumerate(problems):
+            try:
+                decision_matrix, weightValues, positive = self.__prepare(problem["alternatives"], problem.get("weights", {}))
+            except Exception as error:
+                results[i] = error
+                continue
+            groups.setdefault(decision_matrix.shape, []).append((i, decision_matrix, weightValues, positive))
+        for group in groups.values():
+            rankings, relative_closeness = self.topsis_batch(
+                np.stack([problem[1] for problem in group]),
+                np.stack([problem[2] for problem in group]),
+                np.stack([problem[3] for problem in group]))
+            for (i, _, _, _), ranking, closeness in zip(group, rankings, relative_closeness):
+                results[i] = (ranking, closeness)
+        return results
     
+    def calculate_trust(self, scores, weights, penalty, health_events):
+        """
+        ### Calculate Trust Scores
+
+        Calculate the trust scores of many IEs at once as a weighted sum of their sub-scores minus the health events penalty,
+        clipped at 0.
+        
+        :param `scores` (numpy array): Sub-scores matrix (IEs x sub-scores), missing sub-scores as 0
+        :param `weights` (numpy array): Weight of each sub-score
+        :param `penalty` (float): Penalty per health event
+        :param `health_events` (numpy array): Number of health events of each IE
+        :return `trust` (numpy array): Trust score of each IE
+        """
+        trust = scores @ weights
+        trust -= penalty * np.maximum(health_events, 0)
+        return np.maximum(trust, 0, out=trust)
+
     # FIXME: Add impact factoring to the weights (minor feature)
     def calculate_wsum(self, values, weights):
         """
@@ -110,3 +213,200 @@ class TrustAlgorithm:
             result += values[i]*weights[i]
         return result
     
+
+
+class IncrementalTopsis:
+    """
+    ### Incremental TOPSIS Class
+
+    TOPSIS engine for a set of alternatives that changes a few rows at a time. It keeps the decision matrix, the running
+    sum of squares of every column (the normalization norms) and the sorted values of every column (the ideal and
+    negative-ideal solutions), so that adding, updating or removing an alternative does not rebuild and rescan the whole
+    matrix: the norms are updated in O(criteria) and each sorted column is searched in O(log alternatives), but inserting
+    into or deleting from the column lists shifts their elements, so the worst case is O(criteria * alternatives) (a
+    memory move, much cheaper than the rebuild in practice). The closeness of all alternatives is then a single vectorized
+    pass over the stored matrix. A column's sum of squares is recomputed from the matrix when removals cancel most of it
+    (loss of floating-point precision). Results match `TrustAlgorithm.topsis` within floating-point tolerance.
+
+    :param `weights` (dict): Weight values and impacts for each criterion, as in `calculate_topsis`
+    :param `rebuild_ratio` (float): Recompute a column norm when its sum of squares drops below this fraction of its peak
+    """
+
+    def __init__(self, weights, rebuild_ratio=1e-6):
+        self.criteria = list(weights)
+        self.weights, self.positive = TrustAlgorithm().validate_weights(weights)
+        self.rebuild_ratio = rebuild_ratio
+        self.keys = []
+        self.rows = {}
+        self.matrix = np.zeros((16, len(self.criteria)))
+        self.squares = np.zeros(len(self.criteria))
+        self.peaks = np.zeros(len(self.criteria))
+        self.columns = [[] for _ in self.criteria]
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __insert(self, values):
+        """Adds a row's values to the sums of squares and the sorted columns."""
+        self.squares += values ** 2
+        np.maximum(self.peaks, self.squares, out=self.peaks)
+        for column, value in zip(self.columns, values.tolist()):
+            bisect.insort(column, value)
+
+    def __discard(self, values):
+        """Removes a row's values from the sums of squares and the sorted columns."""
+        self.squares -= values ** 2
+        for column, value in zip(self.columns, values.tolist()):
+            del column[bisect.bisect_left(column, value)]
+        # Cancellation: recompute the affected norms from the stored matrix
+        drifted = self.squares < self.peaks * self.rebuild_ratio
+        if drifted.any():
+            self.rebuilds += 1
+            rest = [self.rows[key] for key in self.keys]
+            self.squares[drifted] = (self.matrix[rest][:, drifted] ** 2).sum(axis=0)
+            self.peaks[drifted] = self.squares[drifted]
+
+    def add(self, key, values):
+        """
+        Add an alternative, or update it if `key` is already present.
+
+        :param `key` (str): Alternative id
+        :param `values` (list): Value of each criterion, ordered as the weights
+        """
+        values = np.asarray(values, dtype=float)
+        if values.shape != (len(self.criteria),):
+            raise Exception("Invalid length for alternatives and weights")
+        if key in self.rows:
+            return self.update(key, values)
+        if len(self.keys) == self.matrix.shape[0]:
+            self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+        row = len(self.keys)
+        self.rows[key] = row
+        self.keys.append(key)
+        self.matrix[row] = values
+        self.__insert(values)
+
+    def update(self, key, values):
+        """
+        Update the values of an alternative.
+
+        :param `key` (str): Alternative id
+        :param `values` (list): Value of each criterion, ordered as the weights
+        """
+        values = np.asarray(values, dtype=float)
+        row = self.rows[key]
+        if np.array_equal(self.matrix[row], values):
+            return
+        previous = self.matrix[row].copy()
+        self.matrix[row] = values
+        self.__insert(values)
+        self.__discard(previous)
+
+    def remove(self, key):
+        """
+        Remove an alternative (the last row takes its place in the matrix).
+
+        :param `key` (str): Alternative id
+        """
+        row = self.rows.pop(key)
+        previous = self.matrix[row].copy()
+        last = self.keys.pop()
+        if last != key:
+            self.matrix[row] = self.matrix[len(self.keys)]
+            self.keys[row] = last
+            self.rows[last] = row
+        self.__discard(previous)
+
+    def rebuild(self):
+        """Recompute the sums of squares and the sorted columns from the stored matrix."""
+        matrix = self.matrix[:len(self.keys)]
+        self.squares = (matrix ** 2).sum(axis=0)
+        self.peaks = self.squares.copy()
+        self.columns = [sorted(column) for column in matrix.T.tolist()]
+        self.rebuilds += 1
+
+    def closeness(self):
+        """
+        ### Relative Closeness
+
+        Calculate the TOPSIS relative closeness of every alternative from the maintained norms and ideal solutions.
+
+        :return `closeness` (dict): Relative closeness by alternative id
+        """
+        if len(self.keys) == 0:
+            return {}
+        norms = np.sqrt(self.squares)
+        norms[norms == 0] = 1
+        scale = self.weights / norms
+        maximum = np.array([column[-1] for column in self.columns]) * scale
+        minimum = np.array([column[0] for column in self.columns]) * scale
+        ideal = np.where(self.positive, maximum, minimum)
+        negative_ideal = np.where(self.positive, minimum, maximum)
+        weighted = self.matrix[:len(self.keys)] * scale
+        distance_to_ideal = np.sqrt(((weighted - ideal) ** 2).sum(axis=1))
+        distance_to_negative_ideal = np.sqrt(((weighted - negative_ideal) ** 2).sum(axis=1))
+        relative_closeness = distance_to_negative_ideal / (distance_to_ideal + distance_to_negative_ideal)
+        return dict(zip(self.keys, relative_closeness.tolist()))
+
+
+class EventAggregator:
+    """
+    ### Event Aggregator Class
+
+    Streaming aggregator of prioritized events (security alerts, self-security logs). The state of an IE has a fixed
+    size: one exponentially decayed count and value sum per priority bucket and the time of the last update. Each event
+    is folded in constant time and memory and no event is stored. The score is the weighted mean of the event values
+    (the event's own priority / 5), each event weighted by the configured weight of its priority bucket and by its decay,
+    so older events fade out with the half-life instead of being overwritten by the most recent one. Priorities without
+    a configured bucket take the weight of the nearest bucket but keep their own value (a priority 5 alert scores 1.0).
+
+    :param `weights` (dict): Weight of each priority bucket, as parsed from `priority_<n>` options
+    :param `half_life` (float): Half-life of the counts in seconds (0 disables the decay)
+    """
+
+    def __init__(self, weights, half_life=0):
+        buckets = sorted((int(str(name).rsplit("_", 1)[-1]), float(value["weight"] if isinstance(value, dict) else value)) for name, value in weights.items())
+        if not buckets:
+            raise Exception("Priority weights cannot be empty")
+        self.priorities = [priority for priority, _ in buckets]
+        self.weights = [weight for _, weight in buckets]
+        self.half_life = half_life
+
+    def empty(self):
+        """
+        :return `state` (dict): State without events
+        """
+        return {"counts": [0.0] * len(self.priorities), "values": [0.0] * len(self.priorities), "time": None, "score": None}
+
+    def update(self, state, priorities, now):
+        """
+        ### Fold Events
+
+        Decay the counts to `now` and add the events.
+
+        :param `state` (dict): Current state (None for a new IE)
+        :param `priorities` (list): Priority of each new event
+        :param `now` (float): Timestamp of the events in seconds
+        :return `state` (dict): New state with the `score` (None while no event was counted)
+        """
+        if state and len(state["counts"]) == len(self.priorities):
+            counts, values = list(state["counts"]), list(state["values"])
+        else:
+            counts, values = [0.0] * len(self.priorities), [0.0] * len(self.priorities)
+        if state and state["time"] is not None and self.half_life > 0 and now > state["time"]:
+            decay = 0.5 ** ((now - state["time"]) / self.half_life)
+            counts = [count * decay for count in counts]
+            values = [value * decay for value in values]
+        for priority in priorities:
+            bucket = bisect.bisect_left(self.priorities, priority)
+            if bucket == len(self.priorities) or (bucket > 0 and self.priorities[bucket] - priority > priority - self.priorities[bucket - 1]):
+                bucket -= 1
+            counts[bucket] += 1
+            values[bucket] += priority / 5
+        total = sum(weight * count for weight, count in zip(self.weights, counts))
+        score = sum(weight * value for weight, value in zip(self.weights, values)) / total if total > 0 else None
+        return {"counts": counts, "values": values, "time": now, "score": score}
@@ -0,0 +1,168 @@
+import time
+import asyncio
+import threading
+import httpx
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from trustmanager.metrics import observe_outbound
+
+class HttpClient:
+    """
+    ### HTTP Client Class
+
+    Shared HTTP client for the Orion, IOTA and self-security calls. Connections are kept alive and pooled per host, the number of
+    connections per host is limited (callers wait for a free connection) and every request has connect and read timeouts.
+    Latency and errors are recorded per target service (see `metrics`). Responses and exceptions are the ones of `requests`.
+
+    :param `pool_size` (int): Maximum number of connections per host
+    :param `connect_timeout` (float): Connection timeout in seconds
+    :param `read_timeout` (float): Read timeout in seconds
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3, read_timeout=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pooled session, using the configured timeouts unless `timeout` is provided.
+
+        :param `method` (str): HTTP method
+        :param `url` (str): Request url
+        :return `response` (requests.Response): The response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            observe_outbound(url, time.perf_counter() - start, failed)
+
+    def get(self, url, **kwargs):
+        """Sends a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Sends a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        """Sends a PATCH request."""
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        """Sends a DELETE request."""
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+class AsyncHttpClient:
+    """
+    ### Async HTTP Client Class
+
+    Asyncio variant of `HttpClient` for the FastAPI handlers and the jobs, backed by `httpx.AsyncClient`. Connections are pooled,
+    concurrent requests to the same host are limited to `pool_size` and every request has connect and read timeouts.
+    The pool belongs to one event loop: blocking callers (the scheduled jobs) run their coroutines with `run` on the client's
+    own long-lived loop, so the connections are reused from one job run to the next. Responses and exceptions are the ones of `httpx`.
+
+    :param `pool_size` (int): Maximum number of concurrent connections per host
+    :param `connect_timeout` (float): Connection timeout in seconds
+    :param `read_timeout` (float): Read timeout in seconds
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=3, read_timeout=10):
+        self.pool_size = pool_size
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.client = None
+        self.loop = None
+        self.hosts = {}
+        self.runner = None
+        self.runner_loop = None
+        self.runner_lock = threading.Lock()
+
+    def __session(self):
+        """Returns the client of the running event loop, creating it (and the per-host limits) on first use in that loop."""
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.loop is not loop:
+            self.client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_keepalive_connections=self.pool_size))
+            self.loop = loop
+            self.hosts = {}
+        return self.client
+
+    async def request(self, method, url, **kwargs):
+        """
+        Sends a request through the pooled client, waiting while `pool_size` requests to the same host are in flight.
+
+        :param `method` (str): HTTP method
+        :param `url` (str): Request url
+        :return `response` (httpx.Response): The response
+        """
+        client = self.__session()
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = asyncio.Semaphore(self.pool_size)
+        async with self.hosts[host]:
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+                return response
+            finally:
+                observe_outbound(url, time.perf_counter() - start, failed)
+
+    async def get(self, url, **kwargs):
+        """Sends a GET request."""
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        """Sends a POST request."""
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url, **kwargs):
+        """Sends a PATCH request."""
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        """Sends a DELETE request."""
+        return await self.request("DELETE", url, **kwargs)
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the client's own event loop (started in a background thread on first use) and waits for its result.
+
+        :param `coroutine` (coroutine): Coroutine using the client
+        :return `result`: The result of the coroutine
+        """
+        with self.runner_lock:
+            if self.runner is None:
+                self.runner_loop = asyncio.new_event_loop()
+                self.runner = threading.Thread(target=self.runner_loop.run_forever, name="async-http", daemon=True)
+                self.runner.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.runner_loop).result()
+
+    async def aclose(self):
+        """Closes the pooled connections of the running event loop."""
+        if self.client is not None and self.loop is asyncio.get_running_loop():
+            await self.client.aclose()
+        self.client = None
+
+    def close(self):
+        """Closes the pooled connections and stops the client's event loop."""
+        with self.runner_lock:
+            if self.runner is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.aclose(), self.runner_loop).result()
+            self.runner_loop.call_soon_threadsafe(self.runner_loop.stop)
+            self.runner.join()
+            self.runner_loop.close()
+            self.runner, self.runner_loop = None, None
@@ -0,0 +1,111 @@
+import time
+import threading
+
+class RecomputeCoordinator:
+    """
+    ### Recompute Coordinator Class
+
+    Coalesces trust score recomputations per IE. Events mark an IE dirty and a background thread recomputes each dirty IE
+    once its debounce window has passed, however many events arrived meanwhile. Urgent events flush the window early,
+    but an IE is never recomputed twice within `min_interval` seconds, so an alert storm on one node costs a bounded
+    number of recomputations (and publications).
+
+    :param `recompute` (callable): Function called as `recompute(id, **kwargs)` with the arguments of the latest mark
+    :param `debounce` (float): Seconds between the first event of a window and the recomputation
+    :param `min_interval` (float): Minimum seconds between two recomputations of an IE, also for urgent events
+    """
+
+    def __init__(self, recompute, debounce=10, min_interval=1):
+        self.recompute = recompute
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.condition = threading.Condition()
+        self.dirty = {}
+        self.last_run = {}
+        self.stopped = False
+        self.worker = None
+        self.counters = {"marks": 0, "urgent": 0, "recomputes": 0, "failures": 0}
+
+    def mark(self, id, urgent=False, **kwargs):
+        """
+        ### Mark IE Dirty
+
+        Schedule a recomputation of the IE, coalesced with the pending one.
+
+        :param `id` (str): Id of the IE
+        :param `urgent` (bool): Recompute as soon as `min_interval` allows instead of waiting for the debounce window
+        :param `kwargs` (dict): Arguments of the recomputation
+        """
+        with self.condition:
+            entry = self.dirty.get(id)
+            if entry is None:
+                entry = self.dirty[id] = {"since": time.time(), "urgent": False}
+            entry["urgent"] = entry["urgent"] or urgent
+            entry["kwargs"] = kwargs
+            self.counters["marks"] += 1
+            if urgent:
+                self.counters["urgent"] += 1
+            self.condition.notify()
+
+    def __due(self, id, entry):
+        """Returns the time at which a dirty IE is recomputed."""
+        last = self.last_run.get(id)
+        if entry["urgent"]:
+            return entry["since"] if last is None else max(entry["since"], last + self.min_interval)
+        return (entry["since"] if last is None else max(entry["since"], last)) + self.debounce
+
+    def __run(self):
+        """Recomputes the dirty IEs when they are due, until stopped."""
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped:
+                        return
+                    now = time.time()
+                    due = {id: self.__due(id, entry) for id, entry in self.dirty.items()}
+                    ready = [id for id, at in due.items() if at <= now]
+                    if ready:
+                        break
+                    self.condition.wait(min(due.values()) - now if due else None)
+                batch = [(id, self.dirty.pop(id)["kwargs"]) for id in ready]
+                for id, _ in batch:
+                    self.last_run[id] = now
+            for id, kwargs in batch:
+                try:
+                    self.recompute(id, **kwargs)
+                    self.counters["recomputes"] += 1
+                except Exception as error:
+                    self.counters["failures"] += 1
+                    print(f"[RecomputeCoordinator] Error recomputing {id}: {error}")
+
+    def start(self):
+        """Starts the background recomputation thread."""
+        if self.worker is None:
+            self.stopped = False
+            self.worker = threading.Thread(target=self.__run, daemon=True)
+            self.worker.start()
+
+    def stop(self):
+        """Stops the background thread. Pending recomputations are run first."""
+        with self.condition:
+            pending = [(id, entry["kwargs"]) for id, entry in self.dirty.items()]
+            self.dirty = {}
+            self.stopped = True
+            self.condition.notify()
+        if self.worker is not None:
+            self.worker.join()
+            self.worker = None
+        for id, kwargs in pending:
+            try:
+                self.recompute(id, **kwargs)
+            except Exception as error:
+                print(f"[RecomputeCoordinator] Error recomputing {id}: {error}")
+
+    def stats(self):
+        """
+        ### Coordinator Statistics
+
+        :return `stats` (dict): Number of dirty IEs and the mark, urgent, recompute and failure counters
+        """
+        with self.condition:
+            return {"dirty": len(self.dirty), **self.counters}
@@ -0,0 +1,115 @@
+import queue
+import threading
+
+class IngestionQueue:
+    """
+    ### Ingestion Queue Class
+
+    Bounded in-memory queue with a pool of worker threads for the events pushed to the manager (security notifications,
+    health events). Producers submit events and return immediately; the workers call the handler registered for the
+    event kind. When the queue is full the `overflow` policy applies: `reject` refuses the new event (the producer
+    should answer with a retry hint) and `drop` discards the oldest queued event to make room.
+
+    :param `workers` (int): Number of worker threads
+    :param `maxsize` (int): Maximum number of queued events
+    :param `overflow` (str): Overflow policy, `reject` or `drop`
+    """
+
+    def __init__(self, workers=4, maxsize=1000, overflow="reject"):
+        if overflow not in ("reject", "drop"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.workers = workers
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.queue = queue.Queue(maxsize)
+        self.handlers = {}
+        self.threads = []
+        self.lock = threading.Lock()
+        self.counters = {"accepted": 0, "rejected": 0, "dropped": 0, "processed": 0, "failed": 0}
+        self.busy = 0
+
+    def register(self, kind, handler):
+        """
+        Registers the handler called by the workers for the events of `kind`.
+
+        :param `kind` (str): Event kind
+        :param `handler` (callable): Function receiving the event payload
+        """
+        self.handlers[kind] = handler
+
+    def __count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def submit(self, kind, data):
+        """
+        ### Submit Event
+
+        Queue an event without blocking.
+
+        :param `kind` (str): Event kind
+        :param `data` (dict | list): Event payload
+        :return `accepted` (bool): False if the event was rejected because the queue is full
+        """
+        if kind not in self.handlers:
+            raise KeyError(f"No handler registered for {kind}")
+        while True:
+            try:
+                self.queue.put_nowait((kind, data))
+                self.__count("accepted")
+                return True
+            except queue.Full:
+                if self.overflow == "reject":
+                    self.__count("rejected")
+                    return False
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.__count("dropped")
+            except queue.Empty:
+                pass
+
+    def __run(self):
+        """Worker loop: applies queued events until the stop marker is received."""
+        while True:
+            event = self.queue.get()
+            if event is None:
+                self.queue.task_done()
+                return
+            kind, data = event
+            with self.lock:
+                self.busy += 1
+            try:
+                self.handlers[kind](data)
+                self.__count("processed")
+            except Exception as error:
+                self.__count("failed")
+                print(f"[IngestionQueue] Error processing {kind} event: {error}")
+            finally:
+                with self.lock:
+                    self.busy -= 1
+                self.queue.task_done()
+
+    def start(self):
+        """Starts the worker threads."""
+        if not self.threads:
+            self.threads = [threading.Thread(target=self.__run, daemon=True) for _ in range(self.workers)]
+            for thread in self.threads:
+                thread.start()
+
+    def stop(self):
+        """Processes the queued events and stops the worker threads."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def stats(self):
+        """
+        ### Queue Statistics
+
+        :return `stats` (dict): Queue depth and capacity, busy workers and accepted/rejected/dropped/processed/failed counters
+        """
+        with self.lock:
+            return {"depth": self.queue.qsize(), "maxsize": self.maxsize, "workers": len(self.threads), "busy": self.busy, **self.counters}
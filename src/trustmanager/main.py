@@ -1,9 +1,18 @@
 import json
 import time
+import asyncio
+import threading
 import requests
+import numpy as np
 from datetime import datetime
-from trustmanager.algorithm import TrustAlgorithm
+from collections import Counter
+from trustmanager.algorithm import TrustAlgorithm, IncrementalTopsis, EventAggregator
 from trustmanager.storage import LocalStorage
+from trustmanager.sqlite import SQLiteStorage
+from trustmanager.client import HttpClient, AsyncHttpClient
+from trustmanager.outbox import IotaOutbox
+from trustmanager.registry import IERegistry
+from trustmanager.coordinator import RecomputeCoordinator
 
 class TrustManager:
     """
@@ -11,17 +20,55 @@ class TrustManager:
 
     Provides functionalities for monitoring Trust Agents' through the Orion Broker and updating their Trust Score.
     
-    :param `storage` (dict): Storage file name and reset options
+    :param `storage` (dict): Storage engine, file name, format, reset, journal, flush and index options
     :param `algorithm` (dict): Trust algorithm configurations
+    :param `connections` (dict): HTTP client pool size, timeouts, Orion batch size, IE registry TTL and IOTA outbox options
     """
     # TODO: Initialize storage inside Trust Manager 
     # FIXME: We need to have rel,sec, rep and finally trust calculation methods 
     # FIXME: We can remove orion and iota data from here and use them in the scheduler functions 
-    def __init__(self,storage,algorithm):
+    RELIABILITY_ATTRIBUTES = ["cpuCores", "currentCpuUsage", "ramCapacity", "availableRam", "currentRamUsage"]
+    ORION_PAGE_SIZE = 1000
+    ORION_BATCH_SIZE = 100
+
+    def __init__(self,storage,algorithm,connections={}):
         self.trust = TrustAlgorithm()
-        self.storage = LocalStorage(storage["name"],storage["reset"])
+        client = {name: connections[key] for key, name in (("poolSize", "pool_size"), ("connectTimeout", "connect_timeout"), ("readTimeout", "read_timeout")) if key in connections}
+        self.http = HttpClient(**client)
+        self.async_http = AsyncHttpClient(**client)
+        self.orion_batch_size = connections.get("orionBatchSize", self.ORION_BATCH_SIZE)
+        self.registry_ttl = connections.get("registryTTL", 60)
+        self.registry_refresh_interval = connections.get("registryRefreshInterval", 0)
+        self.registries = {}
+        self.outbox = None
+        if connections.get("iotaOutbox", False):
+            self.outbox = IotaOutbox(
+                storage["name"] + ".outbox",
+                self.http,
+                batch_size=connections.get("iotaBatchSize", 1),
+                interval=connections.get("iotaPublishInterval", 1),
+                max_retry_delay=connections.get("iotaMaxRetryDelay", 60))
+        if storage.get("engine","json") == "sqlite":
+            self.storage = SQLiteStorage(storage["name"],storage["reset"],history=storage.get("history",False))
+        else:
+            self.storage = LocalStorage(
+                storage["name"],
+                storage["reset"],
+                journal=storage.get("journal",False),
+                compact_size=storage.get("compactSize",1000),
+                flush_interval=storage.get("flushInterval",0),
+                flush_writes=storage.get("flushWrites",0),
+                indexes=storage.get("indexes",[]),
+                snapshot_format=storage.get("format","json"))
         self.weights = dict(algorithm["weights"])
         self.penalty = algorithm["healthPenalty"]
+        self.reputation_concurrency = algorithm.get("reputationConcurrency", 20)
+        self.reputation_report = {}
+        self.attributes = dict(algorithm.get("attributes", {}))
+        self.attributes.setdefault("reliability", self.RELIABILITY_ATTRIBUTES)
+        self.reliability_topsis = None
+        self.reliability_lock = threading.Lock()
+        self.subscription = None
         self.scores = {}
         for param in algorithm["params"]:
             self.scores[param] = {}
@@ -32,6 +79,11 @@ class TrustManager:
                     "impact": impact,
                     "weight": weight
                 }
+        self.security_aggregator = EventAggregator(self.scores["security"], algorithm.get("securityHalfLife", 0)) if self.scores.get("security") else None
+        self.coordinator = None
+        if algorithm.get("recomputeDebounce", 0) > 0:
+            self.coordinator = RecomputeCoordinator(self.update_trust_score, algorithm["recomputeDebounce"], algorithm.get("recomputeMinInterval", 1))
+        self.reputation_aggregator = EventAggregator(self.scores["reputation"], algorithm.get("reputationHalfLife", 0)) if self.scores.get("reputation") else None
 
     
     def calculate_elapsed(self,previous_time):
@@ -54,99 +106,257 @@ class TrustManager:
         Calculate the TOPSIS score of the IE and update their values in the localstorage.
         """
         print('[TrustManager] Starting reliability score calculation')
-        IE_IDs = self.__get_all_orion_entities(orion)
-        agent_ids = []
-        decision_matrix = []
-        #print(self.scores["reliability"])
-        #print(IE_IDs)
-        for agent_id in IE_IDs:
-            print(f'[TrustManager] Collected data about {agent_id}')
-            values = []
-            agent = self.__get_entity(orion,agent_id)
-            for key in agent.keys(): # type: ignore
-                #print(key + "\n")
-                if key.lower() in self.scores["reliability"]:
-                    values.append(agent[key]["value"]) # type: ignore
-            agent_ids.append(agent_id)
-            decision_matrix.append(values)
-
-        if len(decision_matrix)== 1:
+        # Single paginated query with an attribute projection (instead of one request per IE)
+        entities = self.__query_orion_entities(orion, self.attributes["reliability"] + ["internalIpAddress"])
+        # The listing also refreshes the IE registry
+        self.ie_registry(orion).put({self.__entity_key(agent["id"]): agent["internalIpAddress"] for agent in entities if agent.get("id") and agent.get("internalIpAddress")})
+        decision_matrix = {}
+        for agent in entities:
+            agent_id, values = self.__reliability_values(agent)
+            if values is None:
+                print(f'[TrustManager] Missing reliability attributes for {agent_id}')
+                continue
+            decision_matrix[agent_id] = values
+        print(f'[TrustManager] Collected data about {len(decision_matrix)} IEs')
+
+        # Apply only the IEs that appeared, changed or disappeared since the previous run to the TOPSIS state
+        with self.reliability_lock:
+            engine = self.__reliability_engine()
+            removed = [agent_id for agent_id in engine.keys if agent_id not in decision_matrix]
+            for agent_id in removed:
+                engine.remove(agent_id)
+            for agent_id, values in decision_matrix.items():
+                engine.add(agent_id, values)
+            print(f'[TrustManager] Removed {len(removed)} IEs from the decision matrix')
+            self.__write_reliability_scores()
+
+    def handle_reliability_notification(self, notification):
+        """
+        ### Handle Reliability Notification
+
+        Apply an NGSI-LD notification of the reliability subscription: only the notified IEs are updated in the TOPSIS
+        state, then the reliability scores are written.
+
+        :param `notification` (dict): NGSI-LD notification with the changed entities in `data`
+        """
+        with self.reliability_lock:
+            engine = self.__reliability_engine()
+            for agent in notification.get("data", []):
+                agent_id, values = self.__reliability_values(agent)
+                if values is not None:
+                    engine.add(agent_id, values)
+                elif agent_id in engine:
+                    # Partial notification: merge the notified attributes into the known values
+                    known = dict(zip(self.scores["reliability"], engine.matrix[engine.rows[agent_id]].tolist()))
+                    known.update({key.lower(): value for key, value in agent.items() if key.lower() in known})
+                    engine.update(agent_id, [known[key] for key in self.scores["reliability"]])
+            print(f'[TrustManager] Applied reliability notification for {len(notification.get("data", []))} IEs')
+            self.__write_reliability_scores()
+
+    def __reliability_values(self, agent):
+        """
+        Extract the reliability values of an entity (key-values or normalized NGSI-LD), ordered as the reliability weights.
+        Attribute names are matched case-insensitively.
+
+        :param `agent` (dict): The entity
+        :return `agent_id`, `values` (str, list): Storage key of the IE and its values (None if an attribute is missing)
+        """
+        agent_id = self.__entity_key(agent.get("id", ""))
+        attributes = {key.lower(): value["value"] if isinstance(value, dict) and "value" in value else value for key, value in agent.items()}
+        if not all(key in attributes for key in self.scores["reliability"]):
+            return agent_id, None
+        return agent_id, [attributes[key] for key in self.scores["reliability"]]
+
+    def __reliability_engine(self):
+        """Returns the incremental TOPSIS state of the reliability scores, creating it on first use."""
+        if self.reliability_topsis is None:
+            self.reliability_topsis = IncrementalTopsis(self.scores["reliability"])
+        return self.reliability_topsis
+
+    def __write_reliability_scores(self):
+        """Writes the reliability scores of the IEs in the TOPSIS state to the storage."""
+        engine = self.reliability_topsis
+        if len(engine) == 0:
+            print('[TrustManager] No agents found')
+            return
+        if len(engine) == 1:
             # Assign reliability score of 1.0 for the single agent (100% as only choice)
             print('[TrustManager] Only one agent found. Assigning default reliability score of 1.0')
-            self.storage.write_item({"reliability": 0.8}, agent_ids[0])
+            self.storage.write_item({"reliability": 0.8}, engine.keys[0])
             return
+        relative_closeness = engine.closeness()
+        self.storage.write_items({agent_id: {"reliability": closeness} for agent_id, closeness in relative_closeness.items()})
+        print(f'[TrustManager] Ideal Solution Closeness: ', relative_closeness)
 
-        print(f'[TrustManager] Decision Matrix:', decision_matrix)
-        rankings, relative_closeness = self.trust.calculate_topsis(decision_matrix,self.scores["reliability"])
-        for i, agent_id in enumerate(agent_ids):
-            print(agent_id, relative_closeness[i])
-            self.storage.write_item({"reliability":relative_closeness[i]},agent_id)
+    def subscribe_reliability(self, orion, endpoint):
+        """
+        ### Subscribe to Reliability Attributes
 
-        print(f'[TrustManager] Alternatives Rankings: ', rankings)
-        print(f'[TrustManager] Ideal Solution Closeness: ', relative_closeness)
+        Register an NGSI-LD subscription on InfrastructureElement entities for the reliability attributes. Orion then
+        notifies `endpoint` with the changed entities (key-values) instead of being polled.
+
+        :param `orion` (str): Url of the Orion broker
+        :param `endpoint` (str): Url of the Trust Manager notification endpoint
+        :return `subscription` (str): Id of the subscription, None on failure
+        """
+        subscription = {
+            "type": "Subscription",
+            "entities": [{"type": "InfrastructureElement"}],
+            "watchedAttributes": self.attributes["reliability"],
+            "notification": {
+                "attributes": self.attributes["reliability"],
+                "format": "keyValues",
+                "endpoint": {"uri": endpoint, "accept": "application/json"}
+            }
+        }
+        try:
+            response = self.http.post(url='http://' + orion + '/ngsi-ld/v1/subscriptions', headers= {"content-type":"application/json"}, data=json.dumps(subscription))
+            response.raise_for_status()
+            self.subscription = response.headers.get("Location", "").rsplit("/", 1)[-1] or None
+            print(f"[TrustManager] Subscribed to reliability attributes: {self.subscription}")
+        except requests.exceptions.RequestException as error:
+            print(f"[TrustManager] Error subscribing to reliability attributes {error}")
+        return self.subscription
+
+    def unsubscribe_reliability(self, orion):
+        """
+        ### Unsubscribe from Reliability Attributes
+
+        Delete the reliability subscription registered by `subscribe_reliability`.
+
+        :param `orion` (str): Url of the Orion broker
+        """
+        if self.subscription is None:
+            return
+        try:
+            response = self.http.delete(url='http://' + orion + '/ngsi-ld/v1/subscriptions/' + self.subscription)
+            response.raise_for_status()
+            self.subscription = None
+        except requests.exceptions.RequestException as error:
+            print(f"[TrustManager] Error deleting subscription {error}")
    
     def calculate_security_score(self,data,domain):
         """
         ### Calculate & Update localstorare security Score
 
-        Calculate the security score of the IE and update their values in the localstorage.
+        Fold security events into the IE's streaming security aggregate (decayed counts per priority weighted with the
+        `[SecurityScore]` weights) and update the security score in the localstorage.
+
+        :param `data` (dict | list): Security event(s) with `mac` and `priority`
+        :param `domain` (str): aerOS domain id
+        :return `security_score` (float): The new security score
         """
         print('[TrustManager] Starting security score calculation')
-        priority_score = 0
-        security_score = 0
-        IE_ID = ""
-        #if list count and save to storage
-        if isinstance(data, list):
-            for event in data:
-                priority_score += event["priority"]
-                #IE_ID = event["node_name"]
-                IE_ID = ""+domain+":" +event["mac"].replace(":", "")
-        
-            security_score = priority_score / len(data)
-        elif isinstance(data, dict):
-            security_score = data["priority"]
-            IE_ID = ""+domain+":" + data["mac"].replace(":", "")
-        #normalized security score
-        else:
+        events = data if isinstance(data, list) else [data] if isinstance(data, dict) else []
+        if not events:
             print("Unknown JSON type")
-        print("sec sb id ", IE_ID)
-        security_score= security_score
-        security_score = security_score/5
+            return 0
+        IE_ID = ""+domain+":" + events[-1]["mac"].replace(":", "")
+        priorities = [event["priority"] for event in events]
+        if self.security_aggregator is None:
+            # No priority weights configured: mean priority of the events
+            security_score = sum(priorities) / len(priorities) / 5
+            self.storage.increment_item(IE_ID, "notifications", data={"security":security_score})
+            return security_score
+
+        # Fold the events into the decayed per-priority counts of the IE (read-modify-write under the storage lock)
+        now = time.time()
+        def fold(item):
+            state = self.security_aggregator.update(item.get("security_state"), priorities, now)
+            return {"security": state["score"], "security_state": state, "notifications": item.get("notifications", 0) + 1}
+        security_score = self.storage.update_item(IE_ID, fold)["security"]
         print("Security Score:",security_score)
-        #IE_ID= ""
-        if IE_ID:
-            storage = self.storage.read_item(IE_ID)
-            if "notifications" in storage:
-                print("Key 'notifications' exists!")
-                self.storage.write_item({"security":security_score, "notifications":storage["notifications"] + 1},IE_ID)
-            else:
-                print("Key 'notifications' does not exist!")
-                self.storage.write_item({"security":security_score, "notifications":1},IE_ID)
         return security_score
 
+    def handle_notification(self, data, domain, orion="", iota="", node="", notification_threshold=4, priority_threshold=3):
+        """
+        ### Handle Security Notification
+
+        Update the security score of the IE from Suricata events and request a trust score update when the number of
+        notifications exceeds `notification_threshold`, or an urgent one when an event has priority `priority_threshold`
+        or higher. A list with events of several IEs is handled per IE (grouped by `mac`).
+
+        :param `data` (dict | list): Security event(s) with `mac` and `priority`
+        :param `domain` (str): aerOS domain id
+        :param `orion` (str): Url of the orion broker
+        :param `iota` (str): Url of the Iota network
+        :param `node` (str): Id of the Iota node
+        :param `notification_threshold` (float): Notifications count triggering a trust score update
+        :param `priority_threshold` (float): Event priority triggering a trust score update
+        :return `security_score` (float): The new security score (of the last IE for a list with several IEs)
+        """
+        groups = {}
+        for event in (data if isinstance(data, list) else [data]):
+            groups.setdefault(event["mac"], []).append(event)
+        for mac, events in groups.items():
+            id = domain + ":" + mac.replace(":", "")
+            security_score = self.calculate_security_score(events, domain)
+            storage = self.storage.read_item(id)
+            max_priority = max(event["priority"] for event in events)
+            if max_priority >= priority_threshold:
+                self.request_trust_update(id, orion, iota, node, urgent=True)
+            elif storage["notifications"] > notification_threshold:
+                self.request_trust_update(id, orion, iota, node)
+        return security_score
+
+    def handle_health(self, data, domain, orion="", iota="", node=""):
+        """
+        ### Handle Health Events
+
+        Register health events (bad news) of an IE. A single event also requests a trust score update.
+
+        :param `data` (dict | list): Health event(s) with `mac_address`
+        :param `domain` (str): aerOS domain id
+        :param `orion` (str): Url of the orion broker
+        :param `iota` (str): Url of the Iota network
+        :param `node` (str): Id of the Iota node
+        """
+        if isinstance(data, list):
+            id = domain + ":" + data[0]["mac_address"].replace(":", "")
+            # Atomic increment (initialized to 0 if missing)
+            self.storage.increment_item(id, "health_events", len(data))
+        else:
+            id = domain + ":" + data["mac_address"].replace(":", "")
+            self.storage.increment_item(id, "health_events")
+            self.request_trust_update(id, orion, iota, node)
+
+    def request_trust_update(self, id, orion="", iota="", node="", urgent=False):
+        """
+        ### Request Trust Score Update
+
+        Mark the IE for a trust score update through the recompute coordinator (coalesced per debounce window, urgent
+        requests flush it early), or update it right away when no coordinator is configured.
+
+        :param `id` (str): Id of the IE
+        :param `orion` (str): Url of the orion broker
+        :param `iota` (str): Url of the Iota network
+        :param `node` (str): Id of the Iota node
+        :param `urgent` (bool): High priority event, recompute as soon as the minimum interval allows
+        """
+        if self.coordinator is not None:
+            self.coordinator.mark(id, urgent, orion=orion, iota=iota, node=node)
+        else:
+            self.update_trust_score(id, orion, iota, node)
+
     def init_security_score(self,orion):
         
         security_score = 5/5
         print("Security Score:",security_score)
-        IE_IDs = self.__get_all_orion_entities(orion)
+        IE_IDs = self.ie_registry(orion).get()
         for IE_ID in IE_IDs:
             if IE_ID:
-                storage = self.storage.read_item(IE_ID)
-                if "notifications" in storage:
-                    print("Key 'notifications' exists!")
-                    self.storage.write_item({"security":security_score, "notifications":storage["notifications"] + 1},IE_ID)
-                else:
-                    print("Key 'notifications' does not exist!")
-                    self.storage.write_item({"security":security_score, "notifications":1},IE_ID)
+                self.storage.increment_item(IE_ID, "notifications", data={"security":security_score})
     
     
     def calculate_reputation_scores(self, orion, port):
         """
         ### Reputation Score
 
-        Update the reputation score of an IE.
+        Update the reputation score of the IEs with the self-security events logged since the previous pull. Health events
+        are reset separately by `reset_health_events`.
         
         :param `orion` (str): Orion broker url
+        :param `port` (str): Port of the self-security events API
         """
         # IE_IDs = self.__get_all_orion_entities(orion)
         # print("Collected IDs:"+str(IE_IDs.keys()))
@@ -198,39 +408,139 @@ class TrustManager:
         #             print("get reputation logs error")
         # except:
         #     print("generar error")
-        IE_IDs = self.__get_all_orion_entities(orion)
+        IE_IDs = self.ie_registry(orion).get()
         print("Collected IDs:"+str(IE_IDs.keys()))
-        for id, ip in IE_IDs.items():
-            reputation = 0
-            try:
-                # FIXME: Need feedback on the reputation log file API (Method, URL, Response Payload)
-                #print(id)
-                response = requests.request(method="GET",url='http://' + ip + ":"+ port + '/events', headers={"accept":"application/json"})
-                # response = requests.request(method="GET",url='http://localhost:9000/events', headers={"accept":"application/json"})
-                #test url
-                #response = requests.request(method="GET",url='http://localhost:8083/self-security-alerts.json', headers={"accept":"application/json"})
-                print('http://' + ip + ":"+ port + '/events')
-                #response.raise_for_status()
-                response.raise_for_status()
-                data = response.json()
-                for event in data:
-                    reputation += event["priority"]
-                print("reputation sum", reputation)
-                #reputation = reputation/len(data)
-                if(len(data)>0):
-                    reputation = reputation/len(data)
-                else:
-                    reputation = 0
-                #normalize reputation score
-                #reputation=3
-                reputation= reputation
-                reputation = reputation/5
-                print(f"reputation score: {reputation}")
-                # FIXME: Are we going to have weight when measuring reputation ?
-                self.storage.write_item({"reputation":reputation, "health_events":0},id)
-            except Exception as error:
-                print(f"[TrustManager] Error getting reputation file {str(error)}")
-                
+        # FIXME: Need feedback on the reputation log file API (Method, URL, Response Payload)
+        states = {}
+        for id in IE_IDs:
+            item = self.storage.read_item(id) or {}
+            states[id] = item.get("reputation_state")
+        states = self.async_http.run(self.__collect_reputation_scores(IE_IDs, port, states))
+        self.storage.write_items({id: dict({"reputation_state":state}, **({"reputation":state["score"]} if state["score"] is not None else {})) for id, state in states.items()})
+
+    def reset_health_events(self):
+        """
+        ### Reset Health Events
+
+        Reset the health events counter of every IE, so that they refer to the last reset interval.
+        """
+        IE_IDs = self.storage.filter_items({"health_events": ("!=", 0)})
+        # Atomic per IE: an increment is either counted before the reset or kept after it
+        for id in IE_IDs:
+            self.storage.update_item(id, lambda item: {"health_events":0})
+        print(f"[TrustManager] Reset the health events of {len(IE_IDs)} IEs")
+
+    def __fold_reputation_events(self, state, data):
+        """
+        Fold the events not seen yet into the IE's running reputation aggregate. The cursor is the last event timestamp
+        seen, together with the events seen at that timestamp: `since` is inclusive and timestamps are coarse, so events
+        at the cursor timestamp are new unless they were already folded (compared as a multiset, repeated identical
+        events still count). Without event timestamps the whole log is aggregated again.
+
+        :param `state` (dict): Current aggregate with its `cursor` and `seen` events (None for a new IE)
+        :param `data` (list): Events returned by the self-security API
+        :return `state` (dict): New aggregate, cursor and events seen at the cursor
+        """
+        cursor = state.get("cursor") if state else None
+        seen = Counter(state.get("seen", [])) if state else Counter()
+        timestamps = [event.get("timestamp") for event in data]
+        if all(timestamp is not None for timestamp in timestamps):
+            identities = [json.dumps(event, sort_keys=True) for event in data]
+            events = [event for event, timestamp in zip(data, timestamps) if cursor is None or timestamp > cursor]
+            at_cursor = Counter(identity for identity, timestamp in zip(identities, timestamps) if timestamp == cursor)
+            repeated = at_cursor - seen
+            for event, identity, timestamp in zip(data, identities, timestamps):
+                if timestamp == cursor and repeated[identity] > 0:
+                    repeated[identity] -= 1
+                    events.append(event)
+            latest = max(timestamps + ([cursor] if cursor is not None else []), default=None)
+            at_latest = Counter(identity for identity, timestamp in zip(identities, timestamps) if timestamp == latest)
+            seen = (seen | at_latest) if latest == cursor else at_latest
+            cursor = latest
+        else:
+            events, state, cursor, seen = data, None, None, Counter()
+        priorities = [event["priority"] for event in events]
+        seen = list(seen.elements())
+        if self.reputation_aggregator is None:
+            # No priority weights configured: mean priority of the pulled events
+            score = sum(priorities) / len(priorities) / 5 if priorities else (state or {}).get("score")
+            return {"score": score, "cursor": cursor, "seen": seen}
+        if not priorities and state:
+            return dict(state, cursor=cursor, seen=seen)
+        new_state = self.reputation_aggregator.update(state, priorities, time.time())
+        new_state["cursor"] = cursor
+        new_state["seen"] = seen
+        return new_state
+
+    async def __collect_reputation_scores(self, IE_IDs, port, states={}):
+        """
+        ### Collect Reputation Scores
+
+        Fetch the new events of the IEs concurrently (at most `reputationConcurrency` requests in flight, each with the
+        client timeouts) and fold them into each IE's reputation aggregate as soon as they arrive. The request carries
+        the IE's cursor as `since` and older events are skipped anyway. The latency and failures of every IE are reported
+        and kept in `reputation_report`.
+        
+        :param `IE_IDs` (dict): Internal ip address of each IE
+        :param `port` (str): Port of the self-security events API
+        :param `states` (dict): Current reputation aggregate and cursor of each IE
+        :return `states` (dict): New reputation aggregate of each IE whose events were fetched
+        """
+        semaphore = asyncio.Semaphore(self.reputation_concurrency)
+
+        async def fetch(id, ip):
+            async with semaphore:
+                start = time.perf_counter()
+                cursor = (states.get(id) or {}).get("cursor")
+                try:
+                    response = await self.async_http.get('http://' + ip + ":"+ port + '/events', headers={"accept":"application/json"},
+                                                         params={"since": cursor} if cursor is not None else None)
+                    response.raise_for_status()
+                    return id, response.json(), time.perf_counter() - start, None
+                except Exception as error:
+                    return id, None, time.perf_counter() - start, error
+
+        reputations = {}
+        report = {}
+        for task in asyncio.as_completed([fetch(id, ip) for id, ip in IE_IDs.items()]):
+            id, data, latency, error = await task
+            if error is None:
+                # A malformed log (not a list, events without priority) only fails its own IE
+                try:
+                    reputations[id] = self.__fold_reputation_events(states.get(id), data)
+                except Exception as fold_error:
+                    error = fold_error
+            report[id] = {"latency": latency, "error": f"{type(error).__name__} {error}" if error else None}
+            if error:
+                print(f"[TrustManager] Error getting reputation file of {id} after {latency * 1000:.0f}ms: {report[id]['error']}")
+                continue
+            print(f"[TrustManager] Reputation score of {id}: {reputations[id]['score']} ({latency * 1000:.0f}ms)")
+        self.reputation_report = report
+        print(f"[TrustManager] Collected {len(reputations)} reputation logs, {len(report) - len(reputations)} failures")
+        return reputations
+
+    def calculate_trust_scores(self, ids):
+        """
+        ### Calculate Trust Scores
+
+        Calculate the Trust Scores of many IEs at once using the stored subscores. The subscores and health events are
+        gathered into arrays and evaluated in a single vectorized operation.
+        
+        :param `ids` (list): Ids of devices to calculate trust scores
+        :return `scores` (dict): Trust score of each stored IE (IEs missing from the storage are skipped)
+        """
+        params = list(self.weights.keys())
+        records = {}
+        for id in ids:
+            record = self.storage.read_item(id)
+            if record is not None:
+                records[id] = record
+        scores = np.array([[record.get(param, 0) for param in params] for record in records.values()], dtype=float).reshape(len(records), len(params))
+        health_events = np.array([record.get("health_events", 0) for record in records.values()], dtype=float)
+        weights = np.array([self.weights[param] for param in params], dtype=float)
+        trust = self.trust.calculate_trust(scores, weights, self.penalty, health_events)
+        return dict(zip(records.keys(), trust.tolist()))
+
     def calculate_trust_score(self, id):
         """
         ### Calculate Trust Score
@@ -239,15 +549,7 @@ class TrustManager:
         
         :param `id` (str): Id of device to calculate trust score
         """
-        storage = self.storage.read_item(id)
-        trust_score = 0
-        for param in storage:
-            if param in self.weights.keys():
-                trust_score += self.weights[param] * storage[param]
-        if "health_events" in storage.keys() and storage["health_events"] > 0:
-            trust_score -= self.penalty * storage["health_events"]
-        if trust_score < 0:
-            trust_score = 0
+        trust_score = self.calculate_trust_scores([id]).get(id, 0)
         print(f"INFO:\t  Calculated trust score for {id}: {trust_score}")
         return trust_score
     
@@ -274,9 +576,17 @@ class TrustManager:
             #self.storage.write_item({"trust":trust_score,"notifications":0},id)
             
         if orion != "": 
-            self.update_orion_score(orion,id,score=trust_score,time=current_timestamp)
+            try:
+                known = id in self.ie_registry(orion)
+            except requests.exceptions.RequestException as error:
+                print(f"[TrustManager] Error refreshing the IE registry {error}")
+                known = True
+            if known:
+                self.update_orion_score(orion,id,score=trust_score,time=current_timestamp)
+            else:
+                print(f"[TrustManager] {id} is not registered in Orion, skipping the Orion update")
         if iota != "" and node !="":
-            self.update_iota_score(iota,node,id,score=trust_score)
+            self.publish_iota_score(iota,node,id,score=trust_score)
     
     def update_trust_scores(self, orion="", iota="", node=""):
         """
@@ -288,25 +598,35 @@ class TrustManager:
         :param `iota` (str): Url of the Iota network
         :param `node` (str): Id of the Iota node
         """
-        IE_IDs = self.__get_all_orion_entities(orion)
-        for id in IE_IDs:
-            data = self.storage.read_item(id)
-            if data != None:
-                current_timestamp = datetime.now().isoformat()
-                trust_score = self.calculate_trust_score(id)
-                self.storage.write_item({"trust":trust_score,"trust_last_update":current_timestamp,"notifications":0},id)
-                #self.storage.write_item({"trust":trust_score,"notifications":0},id)
-            if orion != "": 
-                self.update_orion_score(orion,id,score=trust_score,time=current_timestamp)
+        IE_IDs = self.ie_registry(orion).get()
+        current_timestamp = datetime.now().isoformat()
+        trust_scores = self.calculate_trust_scores(list(IE_IDs))
+        print(f"INFO:\t  Calculated trust scores for {len(trust_scores)} IEs")
+        self.storage.write_items({id: {"trust":trust_score,"trust_last_update":current_timestamp,"notifications":0} for id, trust_score in trust_scores.items()})
+        if orion != "": 
+            self.update_orion_scores(orion,trust_scores,time=current_timestamp)
+        for id, trust_score in trust_scores.items():
             if iota != "" and node !="":
-                print("update IOTA")
                 try:
-                    self.update_iota_score(iota,node,id,score=trust_score)
+                    self.publish_iota_score(iota,node,id,score=trust_score)
                 except Exception as e:
                     print(f"error: {str(e)}")
             else:
                 print("IOTA url not found")
         
+    def ie_registry(self, orion):
+        """
+        ### IE Registry
+
+        Return the registry of the IEs of the Orion broker, shared by all jobs (created on first use).
+        
+        :param `orion` (str): Url of the Orion broker
+        :return `registry` (IERegistry): The registry of the broker
+        """
+        if orion not in self.registries:
+            self.registries.setdefault(orion, IERegistry(lambda: self.__get_all_orion_entities(orion), self.registry_ttl, self.registry_refresh_interval))
+        return self.registries[orion]
+
     # ORION INTERACTIONS
     def __get_all_orion_entities(self, orion):
         """
@@ -317,36 +637,65 @@ class TrustManager:
         :param `orion` (str): Url of the Orion broker
         """
         print("[TrustManager] Requesting NGSI-LD entities...")
-        url = 'http://'+orion+'/ngsi-ld/v1/entities'
-        headers = {
-            'Accept': 'application/json'
-        }
-        params = {
-            'type': 'InfrastructureElement',
-            'local': 'true',
-            'options': 'keyValues',
-        }
-        response = requests.get(url, headers=headers, params=params)
+        entities = self.__query_orion_entities(orion, ["internalIpAddress"])
 
         print("[TrustManager] Entities retrieved!")
         # Iterate over each entity and print its ID
         IE_IDs= dict()
-        for IE in response.json():
+        for IE in entities:
             
             entity_id = IE.get('id', None)
             entity_ip = IE.get('internalIpAddress', None)
             #print(f" whole id: {entity_id}")
             if entity_id and entity_ip:
-                dmn = entity_id.split(":")[-2]
-                ieid = entity_id.split(":")[-1]
-                iek = dmn + ':' + ieid
-                #print(iek)
-                #print(f" domainID: {iek}")
-                #IE_IDs[entity_id.split(":")[-1]] = entity_ip
-                IE_IDs[iek] = entity_ip
+                IE_IDs[self.__entity_key(entity_id)] = entity_ip
             else:
                 print(f"IE for {entity_id} not found!")
         return IE_IDs
+
+    def __query_orion_entities(self, orion, attrs):
+        """
+        ### Query Orion Entities
+
+        Request the InfrastructureElement entities from the Orion broker with an attribute projection, in pages of
+        `ORION_PAGE_SIZE` entities (the total is taken from the `NGSILD-Results-Count` header).
+        
+        :param `orion` (str): Url of the Orion broker
+        :param `attrs` (list): Attributes to include in the response
+        :return `entities` (list): Entities in keyValues format
+        """
+        url = 'http://'+orion+'/ngsi-ld/v1/entities'
+        headers = {
+            'Accept': 'application/json'
+        }
+        params = {
+            'type': 'InfrastructureElement',
+            'local': 'true',
+            'options': 'keyValues',
+            'attrs': ','.join(attrs),
+            'limit': self.ORION_PAGE_SIZE,
+            'count': 'true',
+        }
+        entities = []
+        while True:
+            params['offset'] = len(entities)
+            response = self.http.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            page = response.json()
+            entities.extend(page)
+            total = response.headers.get('NGSILD-Results-Count')
+            if len(page) < self.ORION_PAGE_SIZE or (total is not None and len(entities) >= int(total)):
+                return entities
+
+    def __entity_key(self, entity_id):
+        """
+        ### Entity Storage Key
+
+        Convert an NGSI-LD entity id (urn:ngsi-ld:InfrastructureElement:<domain>:<id>) to the storage key (<domain>:<id>).
+        
+        :param `entity_id` (str): Id of the entity
+        """
+        return ':'.join(entity_id.split(":")[-2:])
     
     def __get_entity(self, orion, id):
         """
@@ -359,7 +708,7 @@ class TrustManager:
         """
         try:
             print('http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id)
-            response = requests.request(method="GET",url='http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id + '?local=true', headers={"accept":"application/json"})
+            response = self.http.get('http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id + '?local=true', headers={"accept":"application/json"})
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as error:
@@ -375,7 +724,7 @@ class TrustManager:
         :param `orion` (str): Url of the Orion broker
         """
         print('[TrustManager] Fetching agent data')
-        IE_IDs = self.__get_all_orion_entities(orion)
+        IE_IDs = self.ie_registry(orion).get()
 
         agent_data = []
         for agent_id in IE_IDs:
@@ -387,22 +736,74 @@ class TrustManager:
          """
         ### Update Orion Score by ID
 
-        Update the trust score value for a specific IE id in the Orion Broker.
+        Update the trust score value and last update time for a specific IE id in the Orion Broker.
         
         :param `orion` (str): Url of the Orion broker
         :param `id` (str): Id of the IE to update
         :param `score` (float): New score of the IE 
+        :param `time` (str): Timestamp of the score
         """
          try:
-            # Patch update to Orion Broker 
-            response = requests.patch(url='http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id+ '/attrs', headers= {"content-type":"application/json"}, data=json.dumps({"trustScore":{"type":"Property","value":score}, }))
+            # Patch update to Orion Broker (both attributes in a single request)
+            response = self.http.patch(url='http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id+ '/attrs', headers= {"content-type":"application/json"},
+                                       data=json.dumps({"trustScore":{"type":"Property","value":score}, "trustScoreLastUpdate":{"type":"Property","value":time}}))
             response.raise_for_status()
-            #response = requests.patch(url='http://' + orion + '/ngsi-ld/v1/entities/urn:ngsi-ld:InfrastructureElement:' + id + '/attrs', headers= {"content-type":"application/json"}, data=json.dumps({"trustScoreLastUpdate":{"type":"Property","value":time}}))
-            #response.raise_for_status()
          except requests.exceptions.RequestException as error:
             print(f"[TrustManager] Error updating entity {error}")
 
+    def update_orion_scores(self, orion, scores, time):
+        """
+        ### Update Orion Scores in Batches
+
+        Update the trust score and last update time of many IEs in the Orion Broker through the NGSI-LD batch update
+        endpoint, in chunks of `orion_batch_size` entities.
+        
+        :param `orion` (str): Url of the Orion broker
+        :param `scores` (dict): New score of each IE id
+        :param `time` (str): Timestamp of the scores
+        :return `errors` (dict): Error reported for each IE that was not updated
+        """
+        entities = [{
+            "id": "urn:ngsi-ld:InfrastructureElement:" + id,
+            "type": "InfrastructureElement",
+            "trustScore": {"type":"Property","value":score},
+            "trustScoreLastUpdate": {"type":"Property","value":time}
+        } for id, score in scores.items()]
+        errors = {}
+        for i in range(0, len(entities), self.orion_batch_size):
+            chunk = entities[i:i + self.orion_batch_size]
+            try:
+                response = self.http.post(url='http://' + orion + '/ngsi-ld/v1/entityOperations/update', headers= {"content-type":"application/json"}, data=json.dumps(chunk))
+                response.raise_for_status()
+                # 204: all entities updated, 207: per-entity errors in the response body
+                if response.status_code == 207:
+                    for error in response.json().get("errors", []):
+                        errors[self.__entity_key(error.get("entityId", ""))] = error.get("error", {}).get("title", str(error.get("error")))
+            except requests.exceptions.RequestException as error:
+                for entity in chunk:
+                    errors[self.__entity_key(entity["id"])] = str(error)
+        for id, error in errors.items():
+            print(f"[TrustManager] Error updating entity {id}: {error}")
+        print(f"[TrustManager] Updated {len(entities) - len(errors)} of {len(entities)} entities in Orion")
+        return errors
+
     # IOTA INTERACTIONS 
+    def publish_iota_score(self, iota_api_url, iota_node_url, id, score):
+        """
+        ### Publish Iota Score
+
+        Enqueue the trust score in the IOTA outbox, or upload it directly when the outbox is disabled.
+
+        :param `iota_api_url` (str): Url of the Iota API
+        :param `iota_node_url` (str): Url of the Iota node
+        :param `id` (str): Id of the relevant IE
+        :param `score` (float): New score of the IE 
+        """
+        if self.outbox is not None:
+            self.outbox.enqueue(iota_api_url, iota_node_url, id, score)
+        else:
+            self.update_iota_score(iota_api_url, iota_node_url, id, score)
+
     def update_iota_score(self, iota_api_url, iota_node_url, id, score):
         """
         ### Update Iota Score
@@ -416,7 +817,7 @@ class TrustManager:
         """
         try:
             # Post update to Iota Node
-            response = requests.post(url='http://' + iota_api_url + '/upload?node=' + iota_node_url, headers= {"content-type":"application/json"}, data=json.dumps({"tag":"trust.score","message":{"score":score, "id":id}}))
+            response = self.http.post(url='http://' + iota_api_url + '/upload?node=' + iota_node_url, headers= {"content-type":"application/json"}, data=json.dumps({"tag":"trust.score","message":{"score":score, "id":id}}))
             print(response.text)
             response.raise_for_status()
         except requests.exceptions.RequestException as error:
@@ -0,0 +1,75 @@
+import time
+from urllib.parse import urlsplit
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus metrics of the Trust Manager (default registry, exposed by the /metrics endpoint)
+
+REQUEST_LATENCY = Histogram("trustmanager_request_duration_seconds", "Latency of the API requests", ["endpoint"],
+                            buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+JOB_DURATION = Histogram("trustmanager_job_duration_seconds", "Duration of the scheduled job runs", ["job"],
+                         buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900))
+JOB_LAST_SUCCESS = Gauge("trustmanager_job_last_success_timestamp_seconds", "Time of the last successful run of each job", ["job"])
+JOB_FAILURES = Counter("trustmanager_job_failures_total", "Failed runs of each job", ["job"])
+OUTBOUND_LATENCY = Histogram("trustmanager_outbound_request_duration_seconds", "Latency of the outbound HTTP calls", ["target"],
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+OUTBOUND_ERRORS = Counter("trustmanager_outbound_errors_total", "Failed outbound HTTP calls (connection errors and error statuses)", ["target"])
+STORAGE_SAVE = Histogram("trustmanager_storage_save_duration_seconds", "Time to save the storage file",
+                         buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+STORAGE_SIZE = Gauge("trustmanager_storage_file_bytes", "Size of the storage file")
+TRACKED_IES = Gauge("trustmanager_tracked_ies", "Number of IEs in the IE registry")
+INGESTION_DEPTH = Gauge("trustmanager_ingestion_queue_depth", "Events waiting in the ingestion queue")
+OUTBOX_DEPTH = Gauge("trustmanager_outbox_depth", "Scores waiting in the IOTA outbox")
+
+def outbound_target(url):
+    """
+    Classify an outbound url by the called service.
+
+    :param `url` (str): Request url
+    :return `target` (str): `orion`, `iota`, `self_security` or `other`
+    """
+    path = urlsplit(url).path
+    if path.startswith("/ngsi-ld/"):
+        return "orion"
+    if path == "/upload":
+        return "iota"
+    if path == "/events":
+        return "self_security"
+    return "other"
+
+def observe_outbound(url, elapsed, failed):
+    """
+    Record an outbound call.
+
+    :param `url` (str): Request url
+    :param `elapsed` (float): Duration in seconds
+    :param `failed` (bool): Whether the call raised or returned an error status
+    """
+    target = outbound_target(url)
+    OUTBOUND_LATENCY.labels(target).observe(elapsed)
+    if failed:
+        OUTBOUND_ERRORS.labels(target).inc()
+
+class MetricsMiddleware:
+    """
+    ### Metrics Middleware Class
+
+    Plain ASGI middleware recording the latency of the requests to the given paths until the response is complete.
+    Other paths are passed through untouched.
+
+    :param `app` (ASGI app): The wrapped application
+    :param `paths` (list): Paths whose latency is recorded
+    """
+
+    def __init__(self, app, paths=()):
+        self.app = app
+        self.histograms = {path: REQUEST_LATENCY.labels(path) for path in paths}
+
+    async def __call__(self, scope, receive, send):
+        histogram = self.histograms.get(scope.get("path")) if scope["type"] == "http" else None
+        if histogram is None:
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            histogram.observe(time.perf_counter() - start)
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import threading
+
+class IotaOutbox:
+    """
+    ### IOTA Outbox Class
+
+    Durable in-process outbox for the trust score messages published to the IOTA API. Scores are enqueued and the caller
+    returns immediately; a background publisher sends them in batched uploads. Messages are coalesced per IE (only the
+    latest score is kept), appended to the outbox file so that pending messages survive a restart, and retried with
+    exponential backoff when an upload fails.
+
+    Uploads of a single message use the `{"tag": "trust.score", "message": {"score", "id"}}` payload; with `batch_size`
+    above 1 the `message` is a list of those objects.
+
+    :param `path` (str): Path of the outbox file
+    :param `http` (HttpClient): HTTP client used for the uploads
+    :param `batch_size` (int): Maximum number of messages per upload
+    :param `interval` (float): Seconds between publishing rounds (messages enqueued meanwhile are coalesced)
+    :param `max_retry_delay` (float): Maximum backoff in seconds after failed uploads
+    """
+
+    def __init__(self, path, http, batch_size=1, interval=1, max_retry_delay=60):
+        self.path = path
+        self.http = http
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_retry_delay = max_retry_delay
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.pending = {}
+        self.sequence = 0
+        self.retry_delay = 0
+        self.published = 0
+        self.failures = 0
+        self.last_latency = None
+        self.publisher = None
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                for line in file:
+                    try:
+                        message = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.__add(message)
+        self.file = open(path, 'a')
+
+    def __add(self, message):
+        """Adds a message to the pending messages, replacing the previous message of the same IE."""
+        self.sequence += 1
+        self.pending[(message["iota"], message["node"], message["id"])] = (self.sequence, message)
+
+    def enqueue(self, iota, node, id, score):
+        """
+        ### Enqueue Score
+
+        Enqueue a trust score message for publication and return immediately.
+
+        :param `iota` (str): Url of the Iota API
+        :param `node` (str): Url of the Iota node
+        :param `id` (str): Id of the relevant IE
+        :param `score` (float): New score of the IE
+        """
+        message = {"iota": iota, "node": node, "id": id, "score": score, "time": time.time()}
+        with self.lock:
+            self.__add(message)
+            self.file.write(json.dumps(message, separators=(",", ":")) + "\n")
+            self.file.flush()
+
+    def publish(self):
+        """
+        ### Publish Pending Messages
+
+        Upload all pending messages in batches. Messages replaced by a newer score during the upload stay pending.
+
+        :return `success` (bool): False if an upload failed
+        """
+        with self.lock:
+            batches = {}
+            for key, (sequence, message) in self.pending.items():
+                batches.setdefault(key[:2], []).append((key, sequence, message))
+        success = True
+        for (iota, node), messages in batches.items():
+            for i in range(0, len(messages), self.batch_size):
+                batch = messages[i:i + self.batch_size]
+                payload = [{"score": message["score"], "id": message["id"]} for _, _, message in batch]
+                start = time.perf_counter()
+                try:
+                    response = self.http.post(url='http://' + iota + '/upload?node=' + node, headers= {"content-type":"application/json"},
+                                              data=json.dumps({"tag":"trust.score","message":payload[0] if self.batch_size == 1 else payload}))
+                    response.raise_for_status()
+                except Exception as error:
+                    self.failures += 1
+                    print(f"[IotaOutbox] Error uploading {len(batch)} scores: {error}")
+                    success = False
+                    break
+                self.last_latency = time.perf_counter() - start
+                self.published += len(batch)
+                with self.lock:
+                    for key, sequence, _ in batch:
+                        if key in self.pending and self.pending[key][0] == sequence:
+                            del self.pending[key]
+        self.__compact()
+        return success
+
+    def __compact(self):
+        """Rewrites the outbox file with the pending messages only."""
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as file:
+                for _, message in sorted(self.pending.values(), key=lambda entry: entry[0]):
+                    file.write(json.dumps(message, separators=(",", ":")) + "\n")
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.file = open(self.path, 'a')
+
+    def __run(self):
+        """Publishes pending messages every `interval` seconds, backing off after failures, until stopped."""
+        while not self.stopped.wait(self.retry_delay or self.interval):
+            if not self.pending:
+                continue
+            if self.publish():
+                self.retry_delay = 0
+            else:
+                self.retry_delay = min(max(self.retry_delay * 2, self.interval), self.max_retry_delay)
+
+    def start(self):
+        """Starts the background publisher."""
+        if self.publisher is None:
+            self.stopped.clear()
+            self.publisher = threading.Thread(target=self.__run, daemon=True)
+            self.publisher.start()
+
+    def stop(self):
+        """Stops the background publisher. Pending messages stay in the outbox file."""
+        self.stopped.set()
+        if self.publisher is not None:
+            self.publisher.join()
+            self.publisher = None
+        with self.lock:
+            self.file.close()
+
+    def stats(self):
+        """
+        ### Outbox Statistics
+
+        :return `stats` (dict): Outbox depth, age of the oldest pending message, published messages, failed uploads,
+        latency of the last upload and current retry delay
+        """
+        with self.lock:
+            times = [message["time"] for _, message in self.pending.values()]
+        return {
+            "depth": len(times),
+            "oldest": time.time() - min(times) if times else 0,
+            "published": self.published,
+            "failures": self.failures,
+            "last_latency": self.last_latency,
+            "retry_delay": self.retry_delay
+        }
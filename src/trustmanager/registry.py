@@ -0,0 +1,145 @@
+import time
+import hashlib
+import threading
+
+class IERegistry:
+    """
+    ### IE Registry Class
+
+    In-memory registry of the Infrastructure Elements of the domain (storage key to internal ip address), shared by the
+    jobs and the ingestion workers. The listing is cached for `ttl` seconds: concurrent readers of a stale registry wait
+    for a single fetch (single-flight) instead of listing the entities once each. By default the registry is only
+    refreshed on demand, when a reader finds it expired, so an idle manager does not poll the broker; a background
+    refresh every `refresh_interval` seconds can be enabled to keep the listing warm. Every refresh is compared with the
+    current listing (digest first, then the added, removed and changed IEs) and the version only increases when the IEs
+    changed.
+
+    :param `fetch` (callable): Function returning the current `{key: ip}` listing
+    :param `ttl` (float): Seconds a listing stays valid
+    :param `refresh_interval` (float): Seconds between background refreshes (0 refreshes on demand only)
+    """
+
+    def __init__(self, fetch, ttl=60, refresh_interval=0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.entities = {}
+        self.digest = None
+        self.version = 0
+        self.updated = None
+        self.fetches = 0
+        self.changes = {"added": [], "removed": [], "changed": []}
+        self.lock = threading.Lock()
+        self.fetching = None
+        self.stopped = threading.Event()
+        self.refresher = None
+
+    def __stale(self):
+        return self.updated is None or time.time() - self.updated >= self.ttl
+
+    def refresh(self):
+        """
+        ### Refresh Registry
+
+        Fetch the listing, or wait for the fetch already in flight.
+
+        :return `entities` (dict): Internal ip address of each IE
+        """
+        with self.lock:
+            flight = self.fetching
+            leader = flight is None
+            if leader:
+                flight = self.fetching = {"done": threading.Event(), "error": None}
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return self.entities
+        try:
+            entities = self.fetch()
+            self.fetches += 1
+            self.put(entities)
+            return entities
+        except Exception as error:
+            flight["error"] = error
+            raise
+        finally:
+            with self.lock:
+                self.fetching = None
+            flight["done"].set()
+
+    def put(self, entities):
+        """
+        Replace the listing with `entities` (e.g. collected by another query) and detect the changes.
+
+        :param `entities` (dict): Internal ip address of each IE
+        """
+        digest = hashlib.sha1(repr(sorted(entities.items())).encode()).hexdigest()
+        with self.lock:
+            if digest != self.digest:
+                previous = self.entities
+                self.changes = {
+                    "added": [key for key in entities if key not in previous],
+                    "removed": [key for key in previous if key not in entities],
+                    "changed": [key for key in entities if key in previous and previous[key] != entities[key]]
+                }
+                self.entities = dict(entities)
+                self.digest = digest
+                self.version += 1
+                print(f"[IERegistry] Version {self.version}: {len(self.changes['added'])} added, {len(self.changes['removed'])} removed, "
+                      f"{len(self.changes['changed'])} changed IEs")
+            self.updated = time.time()
+
+    def get(self):
+        """
+        ### Registered IEs
+
+        :return `entities` (dict): Internal ip address of each IE, refreshed first if the listing expired
+        """
+        if self.__stale():
+            return dict(self.refresh())
+        return dict(self.entities)
+
+    def __contains__(self, key):
+        if self.__stale():
+            self.refresh()
+        return key in self.entities
+
+    def __run(self):
+        """Refreshes the registry every `refresh_interval` seconds, until stopped."""
+        while not self.stopped.wait(max(self.refresh_interval - (time.time() - (self.updated or 0)), 0.1)):
+            if time.time() - (self.updated or 0) < self.refresh_interval:
+                continue
+            try:
+                self.refresh()
+            except Exception as error:
+                print(f"[IERegistry] Error refreshing the IE registry: {error}")
+                self.stopped.wait(min(self.ttl, 10))
+
+    def start(self):
+        """Starts the background refresh, if enabled."""
+        if self.refresher is None and self.refresh_interval > 0:
+            self.stopped.clear()
+            self.refresher = threading.Thread(target=self.__run, daemon=True)
+            self.refresher.start()
+
+    def stop(self):
+        """Stops the background refresh."""
+        self.stopped.set()
+        if self.refresher is not None:
+            self.refresher.join()
+            self.refresher = None
+
+    def stats(self):
+        """
+        ### Registry Statistics
+
+        :return `stats` (dict): Number of IEs, version, age of the listing, fetches and the last changes
+        """
+        return {
+            "entities": len(self.entities),
+            "version": self.version,
+            "age": time.time() - self.updated if self.updated else None,
+            "fetches": self.fetches,
+            "changes": {kind: len(keys) for kind, keys in self.changes.items()}
+        }
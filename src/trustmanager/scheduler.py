@@ -0,0 +1,174 @@
+import time
+import random
+import asyncio
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from trustmanager.metrics import JOB_DURATION, JOB_FAILURES, JOB_LAST_SUCCESS
+
+class Job:
+    """
+    ### Scheduled Job Class
+
+    A blocking function run every `interval` seconds by the `Scheduler`, with its run statistics.
+
+    :param `name` (str): Job name
+    :param `func` (callable): Function to run
+    :param `interval` (float): Seconds between scheduled runs (0 runs the job only once, see `run_at_start`)
+    :param `jitter` (float): Maximum random delay in seconds added to every run
+    :param `catch_up` (str): Overrun policy, `skip` (wait for the next tick) or `once` (run once right away)
+    :param `run_at_start` (bool): Run the job as soon as the scheduler starts
+    :param `kwargs` (dict): Keyword arguments of the function
+    """
+
+    def __init__(self, name, func, interval, jitter=0, catch_up="skip", run_at_start=False, kwargs={}):
+        if catch_up not in ("skip", "once"):
+            raise ValueError(f"Unknown catch-up policy: {catch_up}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.run_at_start = run_at_start
+        self.kwargs = dict(kwargs)
+        self.future = None
+        self.runs = 0
+        self.failures = 0
+        self.missed = 0
+        self.last_start = None
+        self.last_duration = None
+        self.last_error = None
+        self.next_run = None
+
+    @property
+    def running(self):
+        """Whether a run of the job is in progress."""
+        return self.future is not None and not self.future.done()
+
+    def report(self):
+        """
+        ### Job Report
+
+        :return `report` (dict): Interval, state, run counters, last run start/duration/error and next run time
+        """
+        return {
+            "interval": self.interval,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "missed": self.missed,
+            "last_start": datetime.fromtimestamp(self.last_start).isoformat() if self.last_start else None,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "next_run": datetime.fromtimestamp(self.next_run).isoformat() if self.next_run else None
+        }
+
+class Scheduler:
+    """
+    ### Scheduler Class
+
+    Asyncio scheduler for the periodic Trust Manager jobs, started and stopped from the FastAPI lifespan. Every job has
+    its own task and runs in a thread pool, so a slow job does not delay the others. A job never overlaps with itself:
+    ticks passed while it was still running are counted as missed and handled by its catch-up policy.
+
+    :param `workers` (int): Maximum number of jobs running at the same time (defaults to the number of jobs)
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.jobs = {}
+        self.tasks = {}
+        self.executor = None
+
+    def add_job(self, name, func, interval, jitter=0, catch_up="skip", run_at_start=False, **kwargs):
+        """
+        ### Add Job
+
+        Register a blocking function to run every `interval` seconds.
+
+        :param `name` (str): Job name
+        :param `func` (callable): Function to run
+        :param `interval` (float): Seconds between scheduled runs
+        :param `jitter` (float): Maximum random delay in seconds added to every run
+        :param `catch_up` (str): Overrun policy, `skip` or `once`
+        :param `run_at_start` (bool): Run the job as soon as the scheduler starts
+        :return `job` (Job): The registered job
+        """
+        self.jobs[name] = Job(name, func, interval, jitter, catch_up, run_at_start, kwargs)
+        return self.jobs[name]
+
+    async def __run_job(self, job):
+        """Runs the job in the thread pool and waits for it; the outcome is recorded when the run completes."""
+        job.last_start = time.time()
+        start = time.perf_counter()
+
+        def done(future):
+            job.runs += 1
+            job.last_duration = time.perf_counter() - start
+            error = future.exception() if not future.cancelled() else None
+            job.last_error = str(error) if error else None
+            JOB_DURATION.labels(job.name).observe(job.last_duration)
+            if error:
+                job.failures += 1
+                JOB_FAILURES.labels(job.name).inc()
+                print(f"[Scheduler] Job {job.name} failed: {error}")
+            elif not future.cancelled():
+                JOB_LAST_SUCCESS.labels(job.name).set(time.time())
+
+        job.future = self.executor.submit(job.func, **job.kwargs)
+        job.future.add_done_callback(done)
+        try:
+            await asyncio.wrap_future(job.future)
+        except Exception:
+            pass
+
+    async def __loop(self, job):
+        """Schedules the runs of a job until cancelled."""
+        tick = time.time() + (0 if job.run_at_start else job.interval)
+        while True:
+            delay = random.uniform(0, job.jitter) if job.jitter else 0
+            job.next_run = tick + delay
+            await asyncio.sleep(max(0, job.next_run - time.time()))
+            await self.__run_job(job)
+            if job.interval <= 0:
+                job.next_run = None
+                return
+            tick += job.interval
+            now = time.time()
+            if tick <= now:
+                # The run overran its interval: count the passed ticks, then catch up once or wait for the next tick
+                missed = int((now - tick) // job.interval) + 1
+                job.missed += missed
+                tick += missed * job.interval
+                if job.catch_up == "once":
+                    tick = now
+
+    async def start(self):
+        """Starts a task for every registered job."""
+        self.executor = ThreadPoolExecutor(max_workers=self.workers or max(len(self.jobs), 1), thread_name_prefix="job")
+        for name, job in self.jobs.items():
+            self.tasks[name] = asyncio.create_task(self.__loop(job))
+
+    async def stop(self, timeout=30):
+        """
+        Stops scheduling and waits up to `timeout` seconds for the running jobs to finish.
+
+        :param `timeout` (float): Seconds to wait for the running jobs
+        """
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+        running = [asyncio.wrap_future(job.future) for job in self.jobs.values() if job.running]
+        if running:
+            await asyncio.wait(running, timeout=timeout)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def report(self):
+        """
+        ### Jobs Report
+
+        :return `report` (dict): Report of every job by name
+        """
+        return {name: job.report() for name, job in self.jobs.items()}
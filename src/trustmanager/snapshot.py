@@ -0,0 +1,102 @@
+import json
+import mmap
+import struct
+import numpy as np
+
+MAGIC = b"TMSNAP"
+VERSION = 1
+# magic, version, number of items, number of float columns, header length
+HEADER = struct.Struct("<6sHIII")
+
+def dump_snapshot(db, path):
+    """
+    ### Dump Binary Snapshot
+
+    Writes the storage database in the compact snapshot format. Fields holding only float values are stored as contiguous
+    little-endian float64 columns (NaN marks a missing value), every other field is kept in a compact JSON header.
+
+    Layout: fixed header | JSON header (keys, item ids, column names, other fields) | padding to 8 bytes | float64 columns
+
+    :param `db` (dict): Database with the `keys` list and the `data` items
+    :param `path` (str): Path of the snapshot file
+    """
+    items = list(db["data"].keys())
+    records = list(db["data"].values())
+    columns = []
+    for field in db["keys"]:
+        values = [record[field] for record in records if field in record]
+        if values and all(type(value) is float for value in values):
+            columns.append(field)
+    matrix = np.full((len(columns), len(items)), np.nan, dtype="<f8")
+    for c, field in enumerate(columns):
+        matrix[c] = [record.get(field, np.nan) for record in records]
+    other = [{field: value for field, value in record.items() if field not in columns} for record in records]
+    header = json.dumps({"keys": db["keys"], "items": items, "columns": columns, "other": other}, separators=(",", ":")).encode()
+    padding = -(HEADER.size + len(header)) % 8
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(items), len(columns), len(header)))
+        file.write(header)
+        file.write(b"\0" * padding)
+        file.write(matrix.tobytes())
+
+def load_columns(path):
+    """
+    ### Load Binary Snapshot Columns
+
+    Reads the snapshot header in one pass and memory-maps the float columns without building the item dictionaries.
+
+    :param `path` (str): Path of the snapshot file
+    :return `header` (dict): The JSON header (`keys`, `items`, `columns`, `other`)
+    :return `columns` (dict): Read-only float64 arrays per column, backed by the memory-mapped file
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count, width, length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a Trust Manager snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    header = json.loads(buffer[HEADER.size:HEADER.size + length])
+    offset = HEADER.size + length
+    offset += -offset % 8
+    matrix = np.frombuffer(buffer, dtype="<f8", count=count * width, offset=offset).reshape(width, count)
+    return header, dict(zip(header["columns"], matrix))
+
+def load_snapshot(path):
+    """
+    ### Load Binary Snapshot
+
+    Loads a snapshot written by `dump_snapshot` back into the storage database format.
+
+    :param `path` (str): Path of the snapshot file
+    :return `db` (dict): Database with the `keys` list and the `data` items
+    """
+    header, columns = load_columns(path)
+    records = header["other"]
+    for field, column in columns.items():
+        for record, value in zip(records, column.tolist()):
+            if value == value:
+                record[field] = value
+    return {"keys": header["keys"], "data": dict(zip(header["items"], records))}
+
+def convert(source, target):
+    """
+    ### Convert Storage File
+
+    Converts a storage file between the JSON (`.json`) and the binary snapshot (`.tms`) formats, based on the file extensions.
+
+    :param `source` (str): Path of the file to convert
+    :param `target` (str): Path of the converted file
+    :return `count` (int): Number of converted items
+    """
+    if source.endswith(".tms"):
+        db = load_snapshot(source)
+    else:
+        with open(source, 'r') as file:
+            db = json.load(file)
+    if target.endswith(".tms"):
+        dump_snapshot(db, target)
+    else:
+        with open(target, 'w') as file:
+            json.dump(db, file, indent=4)
+    return len(db["data"])
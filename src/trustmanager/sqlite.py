@@ -0,0 +1,287 @@
+import json
+import time
+import uuid
+import sqlite3
+import operator
+import threading
+from prettytable import PrettyTable
+from trustmanager.snapshot import load_snapshot
+
+class SQLiteStorage:
+    """
+    ### SQLite Storage Class
+
+    Storage engine with the same contract as `LocalStorage` (`write_item`, `read_item`, `delete_item`, `filter_items`, `list_keys`),
+    backed by an SQLite database in WAL mode. Every item is stored as a JSON document, and the score fields are mirrored into indexed
+    columns so that filters on them run as SQL range queries. Writes go through a single connection inside transactions, while each
+    reader thread uses its own connection (WAL readers are not blocked by the writer).
+
+    :param `name` (str): name of the storage (used as the filename for the `.db` file)
+    :param `reset` (bool): If True, resets/truncates the database when the class is created.
+    :param `history` (bool): If True, every change of a score field is also appended to the `history` table.
+    """
+    SCORE_FIELDS = ("reliability", "security", "reputation", "trust")
+
+    def __init__(self, name, reset=False, history=False):
+        self.name = name
+        self.filepath = f"{name}.db"
+        self.history = history
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.writer = self.__connect()
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA synchronous=NORMAL")
+        with self.writer:
+            if reset:
+                self.writer.execute("DROP TABLE IF EXISTS items")
+                self.writer.execute("DROP TABLE IF EXISTS fields")
+                self.writer.execute("DROP TABLE IF EXISTS history")
+            columns = ", ".join(f"{field} REAL" for field in self.SCORE_FIELDS)
+            self.writer.execute(f"CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY, data TEXT NOT NULL, {columns})")
+            for field in self.SCORE_FIELDS:
+                self.writer.execute(f"CREATE INDEX IF NOT EXISTS items_{field} ON items ({field})")
+            self.writer.execute("CREATE TABLE IF NOT EXISTS fields (name TEXT PRIMARY KEY, position INTEGER NOT NULL)")
+            self.writer.execute("CREATE TABLE IF NOT EXISTS history (key TEXT NOT NULL, field TEXT NOT NULL, value REAL, timestamp REAL NOT NULL)")
+            self.writer.execute("CREATE INDEX IF NOT EXISTS history_key ON history (key, timestamp)")
+        self.keys = [row[0] for row in self.writer.execute("SELECT name FROM fields ORDER BY position")]
+
+    def __connect(self):
+        """Opens a new connection to the database file."""
+        return sqlite3.connect(self.filepath, check_same_thread=False)
+
+    def __reader(self):
+        """Returns the connection of the calling thread, opening it on first use."""
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.__connect()
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def __column(value):
+        """Returns the value stored in a score column (numbers only)."""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return None
+
+    def __update_keys(self, data):
+        """
+        Updates the `fields` table with unique parameters from the provided data (the caller must hold the lock and a transaction).
+
+        :param data: The dictionary to extract keys from.
+        """
+        for key in data.keys():
+            if key not in self.keys:
+                self.writer.execute("INSERT OR IGNORE INTO fields (name, position) VALUES (?, ?)", (key, len(self.keys)))
+                self.keys.append(key)
+
+    def __write(self, data, key):
+        """
+        Merges the data into the stored item (the caller must hold the lock and a transaction).
+
+        :param data: The dictionary of data to store.
+        :param key: The key of the item.
+        :return: The merged item.
+        """
+        self.__update_keys(data)
+        row = self.writer.execute("SELECT data FROM items WHERE key = ?", (key,)).fetchone()
+        item = json.loads(row[0]) if row else {}
+        item.update(data)
+        self.writer.execute(
+            "INSERT OR REPLACE INTO items (key, data, reliability, security, reputation, trust) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, json.dumps(item, separators=(",", ":"))) + tuple(self.__column(item.get(field)) for field in self.SCORE_FIELDS))
+        if self.history:
+            now = time.time()
+            self.writer.executemany(
+                "INSERT INTO history (key, field, value, timestamp) VALUES (?, ?, ?, ?)",
+                [(key, field, self.__column(data[field]), now) for field in self.SCORE_FIELDS if field in data])
+        return item
+
+    def write_item(self, data, key=""):
+        """
+        Writes a new item to the storage. The key for the item is by default randomly generated, and the global `keys` list is updated to track unique parameters in the data.
+
+        :param data: The dictionary of data to store under a random ID.
+        """
+        if key == "":
+            key = str(uuid.uuid4())
+        with self.lock, self.writer:
+            self.__write(data, key)
+        return key
+
+    def write_items(self, items):
+        """
+        Writes several items in a single transaction.
+
+        :param items: A dictionary where keys are item keys and values are the data dictionaries to merge.
+        """
+        with self.lock, self.writer:
+            for key, data in items.items():
+                self.__write(data, key)
+
+    def increment_item(self, key, field, amount=1, data=None):
+        """
+        Atomically increments a numeric field of an item (missing items and fields start from 0).
+
+        :param key: The key of the item.
+        :param field: The name of the counter field.
+        :param amount: The amount to add to the counter.
+        :param data: Optional dictionary of additional fields written in the same update.
+        :return: The new value of the counter.
+        """
+        with self.lock, self.writer:
+            row = self.writer.execute("SELECT data FROM items WHERE key = ?", (key,)).fetchone()
+            item = json.loads(row[0]) if row else {}
+            update = dict(data) if data else {}
+            update[field] = item.get(field, 0) + amount
+            self.__write(update, key)
+        return update[field]
+
+    def update_item(self, key, update):
+        """
+        Atomically applies a read-modify-write function to an item.
+
+        :param key: The key of the item.
+        :param update: Function receiving the item (an empty dictionary if missing) and returning the fields to write.
+        :return: The written fields.
+        """
+        with self.lock, self.writer:
+            row = self.writer.execute("SELECT data FROM items WHERE key = ?", (key,)).fetchone()
+            data = update(json.loads(row[0]) if row else {})
+            self.__write(data, key)
+        return data
+
+    def read_item(self, key):
+        """
+        Reads and returns the data associated with the given random key.
+
+        :param key: The random key of the item to read.
+        :return: The data associated with the key, or None if the key does not exist.
+        """
+        row = self.__reader().execute("SELECT data FROM items WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def read_history(self, key, field, limit=100):
+        """
+        Reads the most recent recorded values of a score field.
+
+        :param key: The key of the item.
+        :param field: The score field.
+        :param limit: Maximum number of values to return.
+        :return: A list of (timestamp, value) tuples, newest first.
+        """
+        return self.__reader().execute(
+            "SELECT timestamp, value FROM history WHERE key = ? AND field = ? ORDER BY timestamp DESC LIMIT ?",
+            (key, field, limit)).fetchall()
+
+    def delete_item(self, key):
+        """
+        Deletes an item from the storage.
+
+        :param key: The random key of the item to delete.
+        :return: True if the item was deleted, False if the key does not exist.
+        """
+        with self.lock, self.writer:
+            cursor = self.writer.execute("DELETE FROM items WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def snapshot(self):
+        """
+        Returns a consistent point-in-time copy of the database.
+
+        :return: A dictionary with the `keys` list and the `data` items.
+        """
+        rows = self.__reader().execute("SELECT key, data FROM items").fetchall()
+        return {"keys": list(self.keys), "data": {key: json.loads(data) for key, data in rows}}
+
+    def table(self,null="-"):
+        """
+        ## Table print the storage
+
+        Prints all the stored data in a tabular format using PrettyTable.
+
+        :param `null` (str): Placeholder for null values.
+        """
+        db = self.snapshot()
+        table = PrettyTable()
+        table.field_names = ["key"] + db["keys"]
+        for key, item in db["data"].items():
+            table.add_row([key] + [item.get(field, null) for field in db["keys"]])
+        return table
+
+    def list_keys(self):
+        """
+        Lists all unique parameter names in the database (tracked in the `fields` table).
+
+        :return: A list of unique parameter names.
+        """
+        return list(self.keys)
+
+    def filter_items(self, conditions):
+        """
+        Filters and returns the data that match the given dynamic conditions.
+        Conditions on score fields narrow the rows with SQL queries on the indexed columns, and every condition is checked
+        on the returned items. Rows whose column is NULL (missing or non-numeric score) are kept by the query, so the result
+        matches `LocalStorage.filter_items`.
+
+        :param conditions: A dictionary where keys are parameter names and values are tuples/lists of the form (operator, value). Supported operators: ==, !=, >, <, >=, <=.
+        :return: A dictionary of matching items, where keys are the random data keys and values are the data dictionaries.
+        """
+        operators = {
+            "==": operator.eq,
+            "!=": operator.ne,
+            ">": operator.gt,
+            "<": operator.lt,
+            ">=": operator.ge,
+            "<=": operator.le
+        }
+        clauses = []
+        params = []
+        for cond_key, (op, cond_value) in conditions.items():
+            if op not in operators:
+                raise KeyError(op)
+            if cond_key in self.SCORE_FIELDS and self.__column(cond_value) is not None:
+                clauses.append(f"({cond_key} {'=' if op == '==' else op} ? OR {cond_key} IS NULL)")
+                params.append(cond_value)
+        query = "SELECT key, data FROM items"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        result = {}
+        for key, data in self.__reader().execute(query, params):
+            item = json.loads(data)
+            if all(cond_key in item and operators[op](item[cond_key], cond_value) for cond_key, (op, cond_value) in conditions.items()):
+                result[key] = item
+        return result
+
+    def import_json(self, path):
+        """
+        Imports the items of a `LocalStorage` JSON file (or binary snapshot) in a single transaction.
+
+        :param path: Path of the JSON file or binary snapshot (e.g. `scores.json` or `scores.tms`).
+        :return: The number of imported items.
+        """
+        if path.endswith(".tms"):
+            db = load_snapshot(path)
+        else:
+            with open(path, 'r') as file:
+                db = json.load(file)
+        with self.lock, self.writer:
+            self.__update_keys({key: None for key in db.get("keys", [])})
+            for key, data in db["data"].items():
+                self.__write(data, key)
+        return len(db["data"])
+
+    def flush(self):
+        """
+        Writes any pending changes to disk. Transactions are committed on every write, so this only checkpoints the WAL file.
+        """
+        with self.lock:
+            self.writer.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        """
+        Checkpoints the WAL file and closes the writer connection.
+        """
+        with self.lock:
+            self.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.writer.close()
@@ -1,8 +1,107 @@
 import json
 import os
+import time
 import uuid
 import operator
+import threading
+from bisect import bisect_left, bisect_right
 from prettytable import PrettyTable
+from trustmanager.snapshot import dump_snapshot, load_snapshot
+from trustmanager.metrics import STORAGE_SAVE, STORAGE_SIZE
+
+class SortedIndex:
+    """
+    ### Sorted Index Class
+
+    Secondary index on a numeric field of the stored items. Keeps the (value, key) pairs sorted so that equality and range conditions
+    are answered with bisect lookups instead of a full scan. Items with a non-numeric value for the field are tracked separately and
+    always returned as candidates.
+
+    :param `field` (str): Name of the indexed field
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self.entries = []
+        self.values = []
+        self.other = set()
+
+    @staticmethod
+    def indexable(value):
+        """
+        Checks whether a value can be stored in the sorted index (numbers except booleans and NaN).
+
+        :param value: The value to check.
+        :return: True if the value is indexable.
+        """
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+    def build(self, data):
+        """
+        Builds the index from scratch.
+
+        :param data: The dictionary of stored items.
+        """
+        self.entries = []
+        self.other = set()
+        for key, item in data.items():
+            if self.field not in item:
+                continue
+            if self.indexable(item[self.field]):
+                self.entries.append((item[self.field], key))
+            else:
+                self.other.add(key)
+        self.entries.sort()
+        self.values = [value for value, _ in self.entries]
+
+    def add(self, key, value):
+        """
+        Adds an item value to the index.
+
+        :param key: The key of the item.
+        :param value: The value of the indexed field.
+        """
+        if not self.indexable(value):
+            self.other.add(key)
+            return
+        i = bisect_left(self.entries, (value, key))
+        self.entries.insert(i, (value, key))
+        self.values.insert(i, value)
+
+    def remove(self, key, value):
+        """
+        Removes an item value from the index.
+
+        :param key: The key of the item.
+        :param value: The indexed value of the item.
+        """
+        if not self.indexable(value):
+            self.other.discard(key)
+            return
+        i = bisect_left(self.entries, (value, key))
+        if i < len(self.entries) and self.entries[i] == (value, key):
+            del self.entries[i]
+            del self.values[i]
+
+    def lookup(self, op, value):
+        """
+        Returns the keys that may satisfy a condition on the indexed field.
+
+        :param op: The condition operator (==, >, <, >=, <=).
+        :param value: The numeric value to compare against.
+        :return: A set of candidate keys.
+        """
+        if op == "==":
+            lo, hi = bisect_left(self.values, value), bisect_right(self.values, value)
+        elif op == ">":
+            lo, hi = bisect_right(self.values, value), len(self.values)
+        elif op == ">=":
+            lo, hi = bisect_left(self.values, value), len(self.values)
+        elif op == "<":
+            lo, hi = 0, bisect_left(self.values, value)
+        else:
+            lo, hi = 0, bisect_right(self.values, value)
+        return {key for _, key in self.entries[lo:hi]} | self.other
 
 class LocalStorage:
     """
@@ -14,28 +113,228 @@ class LocalStorage:
     - Security Score (network threats, severity/priority)
     - Reputation Score (weekly historical data from self-sec & self-heal)
 
-    :param `name` (str): name of the storage (used as the filename for the JSON file)
+    The storage is safe for concurrent use: writers are serialized by a short lock, records are copy-on-write (a write replaces the
+    stored dictionary instead of mutating it) so readers always see consistent snapshots, and the JSON file is written outside of the lock.
+
+    :param `name` (str): name of the storage (used as the filename for the JSON or binary snapshot file)
     :param `reset` (bool): If True, resets/truncates the database when the class is created.
+    :param `journal` (bool): If True, mutations are appended to a write-ahead log (`<name>.log`) instead of rewriting the JSON file.
+    :param `compact_size` (int): Number of log records after which the log is compacted into the JSON snapshot in the background.
+    :param `flush_interval` (float): Seconds between background flushes of pending writes. 0 disables the timer.
+    :param `flush_writes` (int): Number of pending writes that forces a flush. With both options at 0 every write is flushed immediately.
+    :param `indexes` (list): Numeric fields to maintain sorted secondary indexes on (used by `filter_items` for range and equality conditions).
+    :param `snapshot_format` (str): Snapshot file format, `json` (`<name>.json`) or `binary` (`<name>.tms`, see `trustmanager.snapshot`).
     """
     
-    def __init__(self, name, reset=False):
+    def __init__(self, name, reset=False, journal=False, compact_size=1000, flush_interval=0, flush_writes=0, indexes=(), snapshot_format="json"):
         self.name = name
-        self.filepath = f"{name}.json"
+        self.binary = snapshot_format == "binary"
+        self.filepath = f"{name}.tms" if self.binary else f"{name}.json"
+        self.journal = journal
+        self.journal_path = f"{name}.log"
+        self.compact_size = compact_size
+        self.journal_records = 0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.compactor = None
+        self.log = None
+        self.flush_interval = flush_interval
+        self.flush_writes = flush_writes
+        self.deferred = flush_interval > 0 or flush_writes > 1
+        self.dirty = False
+        self.pending = []
+        self.pending_writes = 0
+        self.flusher = None
+        self.stop_flusher = threading.Event()
+        self.indexes = {}
         if reset or not os.path.exists(self.filepath):
             self.db = {"keys": [], "data": {}}
-            self.__save_db()
+            for path in (self.journal_path, self.journal_path + ".1"):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.__save_db(self.db)
         else:
             self.db = self.__load_db()
+            if journal:
+                self.__replay_log()
+        for field in indexes:
+            self.indexes[field] = SortedIndex(field)
+            self.indexes[field].build(self.db["data"])
+        if journal:
+            self.log = open(self.journal_path, 'a')
+        if flush_interval > 0:
+            self.flusher = threading.Thread(target=self.__run_flusher, daemon=True)
+            self.flusher.start()
 
     def __load_db(self):
-        """Loads the database from the JSON file."""
+        """Loads the database from the JSON file (or the binary snapshot)."""
+        if self.binary:
+            return load_snapshot(self.filepath)
         with open(self.filepath, 'r') as file:
             return json.load(file)
 
-    def __save_db(self):
-        """Saves the current state of the database to the JSON file."""
-        with open(self.filepath, 'w') as file:
-            json.dump(self.db, file, indent=4)
+    def __save_db(self, db):
+        """
+        Saves a snapshot of the database to the JSON file (or the binary snapshot).
+
+        :param db: The snapshot to save (see `snapshot`).
+        """
+        start = time.perf_counter()
+        tmp_path = self.filepath + ".tmp"
+        if self.binary:
+            dump_snapshot(db, tmp_path)
+        else:
+            with open(tmp_path, 'w') as file:
+                json.dump(db, file, indent=4)
+        os.replace(tmp_path, self.filepath)
+        STORAGE_SAVE.observe(time.perf_counter() - start)
+        STORAGE_SIZE.set(os.path.getsize(self.filepath))
+
+    def __snapshot(self):
+        """Returns a consistent copy of the database (the caller must hold the lock). Records are copy-on-write, so a shallow copy is enough."""
+        return {"keys": list(self.db["keys"]), "data": dict(self.db["data"])}
+
+    def snapshot(self):
+        """
+        Returns a consistent point-in-time copy of the database, which can be iterated while other threads keep writing.
+
+        :return: A dictionary with the `keys` list and the `data` items.
+        """
+        with self.lock:
+            return self.__snapshot()
+
+    def __replay_log(self):
+        """
+        Replays the write-ahead log on top of the loaded snapshot. A log left behind by an unfinished compaction (`<name>.log.1`) is replayed first.
+        A truncated last record (crash during append) is ignored and cut from the file, so the next record starts on a new line.
+        After recovering from an unfinished compaction the snapshot is saved right away and both logs are cleared, so the next
+        compaction cannot rotate the active log over the recovered one.
+        """
+        rotated = os.path.exists(self.journal_path + ".1")
+        for path in (self.journal_path + ".1", self.journal_path):
+            if not os.path.exists(path):
+                continue
+            complete = 0
+            with open(path, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        print(f"[LocalStorage] Discarding truncated log record in {path}")
+                        break
+                    complete += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        print(f"[LocalStorage] Skipping corrupted log record in {path}")
+                        continue
+                    if record["o"] == "w":
+                        self.__apply_write(record["d"], record["k"])
+                    elif record["o"] == "d":
+                        self.db["data"].pop(record["k"], None)
+                    self.journal_records += 1
+            if complete < os.path.getsize(path):
+                os.truncate(path, complete)
+        if rotated:
+            self.__save_db(self.db)
+            os.remove(self.journal_path + ".1")
+            if os.path.exists(self.journal_path):
+                os.truncate(self.journal_path, 0)
+            self.journal_records = 0
+
+    def __commit(self, *records):
+        """
+        Records mutations according to the durability policy (the caller must hold the lock). In write-through mode the changes must be
+        flushed immediately, otherwise the storage is marked dirty and the changes are flushed together with the rest of the burst.
+
+        :param records: The mutation records (`o`: operation, `k`: key, `d`: data).
+        :return: True if the caller must flush the JSON file after releasing the lock.
+        """
+        if self.journal:
+            self.pending.extend(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        self.dirty = True
+        self.pending_writes += len(records)
+        if not self.deferred or (self.flush_writes > 0 and self.pending_writes >= self.flush_writes):
+            if self.journal:
+                self.__flush_log()
+                return False
+            return True
+        return False
+
+    def __flush_log(self):
+        """
+        Appends the pending records to the log in a single write (the caller must hold the lock) and triggers a background compaction
+        once the log grows past `compact_size`.
+        """
+        if not self.dirty:
+            return
+        self.log.write("".join(self.pending))
+        self.log.flush()
+        self.journal_records += len(self.pending)
+        self.pending = []
+        self.dirty = False
+        self.pending_writes = 0
+        if self.journal_records >= self.compact_size and self.compactor is None:
+            self.compactor = threading.Thread(target=self.compact, daemon=True)
+            self.compactor.start()
+
+    def __run_flusher(self):
+        """Flushes pending changes every `flush_interval` seconds until the storage is closed."""
+        while not self.stop_flusher.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """
+        Writes any pending changes to disk. The JSON file is serialized from a snapshot outside of the writer lock.
+        """
+        if self.journal:
+            with self.lock:
+                if self.log is not None:
+                    self.__flush_log()
+            return
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                self.dirty = False
+                self.pending_writes = 0
+                db = self.__snapshot()
+            self.__save_db(db)
+
+    def close(self):
+        """
+        Stops the background flusher, flushes pending changes and closes the log. Call on shutdown when writes are deferred.
+        """
+        self.stop_flusher.set()
+        if self.flusher is not None:
+            self.flusher.join()
+            self.flusher = None
+        self.flush()
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+        with self.lock:
+            if self.log is not None:
+                self.log.close()
+                self.log = None
+
+    def compact(self):
+        """
+        Compacts the write-ahead log into the JSON snapshot. The active log is rotated under the lock, so writers are only blocked while the
+        in-memory database is copied; the snapshot itself is written outside of it.
+        """
+        try:
+            with self.save_lock:
+                with self.lock:
+                    db = self.__snapshot()
+                    self.log.close()
+                    os.replace(self.journal_path, self.journal_path + ".1")
+                    self.log = open(self.journal_path, 'a')
+                    self.journal_records = 0
+                self.__save_db(db)
+                os.remove(self.journal_path + ".1")
+        except OSError as error:
+            print(f"[LocalStorage] Error compacting log {error}")
+        finally:
+            self.compactor = None
 
     def __update_keys(self, data):
         """
@@ -57,23 +356,90 @@ class LocalStorage:
         """
         if key == "":
             key=str(uuid.uuid4())
-        self.__update_keys(data)
-        if key in self.db["data"]:
-            self.db["data"][key].update(data)
-        else:
-            self.db["data"][key] = data
-        self.__save_db()
+        with self.lock:
+            self.__apply_write(data, key)
+            flush = self.__commit({"o": "w", "k": key, "d": data})
+        if flush:
+            self.flush()
 
         return key
 
+    def write_items(self, items):
+        """
+        Writes several items as one batch: the writer lock is taken once and the changes are flushed together.
+
+        :param items: A dictionary where keys are item keys and values are the data dictionaries to merge.
+        """
+        if not items:
+            return
+        with self.lock:
+            for key, data in items.items():
+                self.__apply_write(data, key)
+            flush = self.__commit(*[{"o": "w", "k": key, "d": data} for key, data in items.items()])
+        if flush:
+            self.flush()
+
+    def increment_item(self, key, field, amount=1, data=None):
+        """
+        Atomically increments a numeric field of an item (missing items and fields start from 0).
+
+        :param key: The key of the item.
+        :param field: The name of the counter field.
+        :param amount: The amount to add to the counter.
+        :param data: Optional dictionary of additional fields written in the same update.
+        :return: The new value of the counter.
+        """
+        with self.lock:
+            item = self.db["data"].get(key) or {}
+            update = dict(data) if data else {}
+            update[field] = item.get(field, 0) + amount
+            self.__apply_write(update, key)
+            flush = self.__commit({"o": "w", "k": key, "d": update})
+        if flush:
+            self.flush()
+        return update[field]
+
+    def update_item(self, key, update):
+        """
+        Atomically applies a read-modify-write function to an item.
+
+        :param key: The key of the item.
+        :param update: Function receiving a copy of the item (an empty dictionary if missing) and returning the fields to write.
+        :return: The written fields.
+        """
+        with self.lock:
+            data = update(dict(self.db["data"].get(key) or {}))
+            self.__apply_write(data, key)
+            flush = self.__commit({"o": "w", "k": key, "d": data})
+        if flush:
+            self.flush()
+        return data
+
+    def __apply_write(self, data, key):
+        """
+        Applies a write to the in-memory database. The stored record is replaced by a merged copy, never mutated in place.
+
+        :param data: The dictionary of data to store.
+        :param key: The key of the item.
+        """
+        self.__update_keys(data)
+        item = self.db["data"].get(key)
+        for field, index in self.indexes.items():
+            if field in data:
+                if item is not None and field in item:
+                    index.remove(key, item[field])
+                index.add(key, data[field])
+        self.db["data"][key] = dict(data) if item is None else {**item, **data}
+
     def read_item(self, key):
         """
         Reads and returns the data associated with the given random key.
         
         :param key: The random key of the item to read.
-        :return: The data associated with the key, or None if the key does not exist.
+        :return: A copy of the data associated with the key, or None if the key does not exist.
         """
-        return self.db["data"].get(key, None)
+        item = self.db["data"].get(key, None)
+        return dict(item) if item is not None else None
 
     def delete_item(self, key):
         """
@@ -82,16 +448,20 @@ class LocalStorage:
         :param key: The random key of the item to delete.
         :return: True if the item was deleted, False if the key does not exist.
         """
-        if key in self.db["data"]:
+        with self.lock:
+            if key not in self.db["data"]:
+                return False
             # Remove the data associated with the key
-            del self.db["data"][key]
-            
-            # Save changes to the JSON file
-            self.__save_db()
+            item = self.db["data"].pop(key)
+            for field, index in self.indexes.items():
+                if field in item:
+                    index.remove(key, item[field])
             
-            return True
-        else:
-            return False
+            # Save changes to the JSON file (or log the deletion)
+            flush = self.__commit({"o": "d", "k": key})
+        if flush:
+            self.flush()
+        return True
 
     def table(self,null="-"):
         """
@@ -102,12 +472,13 @@ class LocalStorage:
 
         :param `null` (str): Placeholder for null values.
         """
+        db = self.snapshot()
         table = PrettyTable()
-        table.field_names = ["key"] + self.db["keys"]
-        for key, item in self.db["data"].items():
+        table.field_names = ["key"] + db["keys"]
+        for key, item in db["data"].items():
             row = [key]
             
-            for field in self.db["keys"]:
+            for field in db["keys"]:
                 row.append(item.get(field, null))
             
             table.add_row(row)
@@ -119,11 +490,12 @@ class LocalStorage:
         
         :return: A list of unique parameter names.
         """
-        return self.db["keys"]
+        return list(self.db["keys"])
 
     def filter_items(self, conditions):
         """
         Filters and returns the data that match the given dynamic conditions.
+        Conditions on indexed fields (other than !=) narrow the candidates with bisect lookups; the remaining items are not scanned.
 
         :param conditions: A dictionary where keys are parameter names and values are tuples/lists of the form (operator, value). Supported operators: ==, !=, >, <, >=, <=.
         :return: A dictionary of matching items, where keys are the random data keys and values are the data dictionaries.
@@ -137,7 +509,17 @@ class LocalStorage:
             "<=": operator.le
         }
         result = {}
-        for key, item in self.db["data"].items():
+        with self.lock:
+            candidates = None
+            for cond_key, (op, cond_value) in conditions.items():
+                if cond_key in self.indexes and op != "!=" and SortedIndex.indexable(cond_value):
+                    keys = self.indexes[cond_key].lookup(op, cond_value)
+                    candidates = keys if candidates is None else candidates & keys
+            if candidates is None:
+                items = dict(self.db["data"])
+            else:
+                items = {key: self.db["data"][key] for key in candidates}
+        for key, item in items.items():
             match = True  # Flag to check if all conditions are satisfied
             for cond_key, (op, cond_value) in conditions.items():
                 if cond_key in item:
@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager import TrustManager
+from stub_servers import StubOrion
+
+# Reliability data collection against a local stub broker: one request per IE (N+1) vs paginated attrs projection
+count = 5000
+latency = 0.001
+
+weights = {"cpucores": "+0.2", "currentcpuusage": "-0.2", "ramcapacity": "+0.1", "availableram": "+0.25", "currentramusage": "-0.25"}
+
+with tempfile.TemporaryDirectory() as directory, StubOrion(count, latency=latency) as orion:
+    manager = TrustManager(
+        {"name": os.path.join(directory, "scores"), "reset": True},
+        {"healthPenalty": 0.01, "weights": {"reliability": 0.3, "security": 0.5, "reputation": 0.2}, "params": {"reliability": weights}})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Previous behaviour: list all IEs, then fetch every IE again
+        start = time.perf_counter()
+        requests_before = orion.requests
+        IE_IDs = manager._TrustManager__get_all_orion_entities(orion.address)
+        for agent_id in IE_IDs:
+            manager._TrustManager__get_entity(orion.address, agent_id)
+        n_plus_one = time.perf_counter() - start
+        n_plus_one_requests = orion.requests - requests_before
+
+        # Paginated projection
+        start = time.perf_counter()
+        requests_before = orion.requests
+        manager.calculate_reliability_scores(orion.address)
+        paginated = time.perf_counter() - start
+        paginated_requests = orion.requests - requests_before
+
+    scored = len(manager.storage.filter_items({"reliability": (">=", 0)}))
+    print(f"IEs: {count} (stub latency {latency * 1000:.1f}ms per request)")
+    print(f"N+1 fetch:            {n_plus_one:8.2f}s  {n_plus_one_requests:6} requests")
+    print(f"Paginated projection: {paginated:8.2f}s  {paginated_requests:6} requests (incl. TOPSIS and storage, {scored} IEs scored)")
@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager.snapshot import dump_snapshot, load_snapshot, load_columns
+
+# Load & save times of the JSON storage file and the binary snapshot format
+sizes = [1000, 10000, 100000]
+repeats = 3
+
+def generate(count):
+    db = {"keys": ["reliability", "security", "notifications", "reputation", "health_events", "trust", "trust_last_update"], "data": {}}
+    for i in range(count):
+        db["data"][f"MyDomain:{i:012x}"] = {
+            "reliability": random.random(),
+            "security": random.random(),
+            "notifications": random.randint(0, 10),
+            "reputation": random.random(),
+            "health_events": random.randint(0, 3),
+            "trust": random.random(),
+            "trust_last_update": "2025-03-06T11:30:54.148792"
+        }
+    return db
+
+def measure(function):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def save_json(db, path):
+    with open(path, 'w') as file:
+        json.dump(db, file, indent=4)
+
+def load_json(path):
+    with open(path, 'r') as file:
+        return json.load(file)
+
+with tempfile.TemporaryDirectory() as directory:
+    json_path = os.path.join(directory, "scores.json")
+    binary_path = os.path.join(directory, "scores.tms")
+    print(f"{'IEs':>8} {'json save':>12} {'json load':>12} {'bin save':>12} {'bin load':>12} {'bin mmap':>12} {'json size':>12} {'bin size':>12}")
+    for size in sizes:
+        db = generate(size)
+        json_save = measure(lambda: save_json(db, json_path))
+        json_load = measure(lambda: load_json(json_path))
+        binary_save = measure(lambda: dump_snapshot(db, binary_path))
+        binary_load = measure(lambda: load_snapshot(binary_path))
+        binary_mmap = measure(lambda: load_columns(binary_path))
+        assert load_snapshot(binary_path) == load_json(json_path)
+        print(f"{size:>8} {json_save:>10.1f}ms {json_load:>10.1f}ms {binary_save:>10.1f}ms {binary_load:>10.1f}ms {binary_mmap:>10.1f}ms "
+              f"{os.path.getsize(json_path) // 1024:>10}KB {os.path.getsize(binary_path) // 1024:>10}KB")
@@ -0,0 +1,118 @@
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timedelta
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager import TrustManager
+from stub_servers import StubOrion, StubIota, StubSelfSecurity
+
+# Benchmark suite of the Trust Manager jobs against in-process stub Orion, IOTA and self-security servers.
+# Every IE of the stub broker points at the local self-security stub, so each IE pulls an events log of `--events` entries.
+# Results are printed as a table and written as JSON (one record per benchmark and scale) to track regressions across versions.
+#
+#   python test/bench_suite.py --scales 100,1000,5000 --output bench.json
+
+parser = argparse.ArgumentParser(description="Trust Manager benchmark suite")
+parser.add_argument("--scales", default="100,1000,5000", help="comma-separated numbers of IEs")
+parser.add_argument("--latency", type=float, default=0.001, help="stub server latency per request in seconds")
+parser.add_argument("--events", type=int, default=20, help="self-security events per IE log")
+parser.add_argument("--repeats", type=int, default=3, help="runs per measurement (best time is kept)")
+parser.add_argument("--output", default="bench_results.json", help="JSON results file ('-' for stdout only)")
+args = parser.parse_args()
+
+weights = {"cpucores": "+0.2", "currentcpuusage": "-0.2", "ramcapacity": "+0.1", "availableram": "+0.25", "currentramusage": "-0.25"}
+priorities = {"priority_1": "0.25", "priority_2": "0.35", "priority_3": "0.4"}
+
+def version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def once(function, servers=()):
+    # Time of a single run, with the number of stub requests it made
+    before = sum(server.requests for server in servers)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    return time.perf_counter() - start, sum(server.requests for server in servers) - before
+
+def measure(function, servers=()):
+    # Best of `repeats` runs, for the benchmarks whose runs do the same work every time
+    return min(once(function, servers) for _ in range(args.repeats))
+
+def manager(directory):
+    return TrustManager(
+        {"name": os.path.join(directory, "scores"), "reset": True},
+        {"healthPenalty": 0.01, "weights": {"reliability": 0.3, "security": 0.5, "reputation": 0.2},
+         "params": {"reliability": weights, "security": priorities, "reputation": priorities}},
+        {"iotaOutbox": True, "iotaBatchSize": 100, "registryTTL": 3600})
+
+results = []
+
+def record(benchmark, scale, seconds, requests=None):
+    results.append({"benchmark": benchmark, "scale": scale, "seconds": seconds, "requests": requests})
+    print(f"{benchmark:>24} {scale:>8} {seconds * 1000:>12.2f}ms {'' if requests is None else requests:>10}")
+
+print(f"{'benchmark':>24} {'IEs':>8} {'time':>14} {'requests':>10}")
+generator = np.random.default_rng(0)
+for scale in [int(value) for value in args.scales.split(",")]:
+    with tempfile.TemporaryDirectory() as directory, StubOrion(scale, latency=args.latency) as orion, \
+            StubIota(latency=args.latency) as iota, StubSelfSecurity(latency=args.latency) as security:
+        for entity in orion.entities.values():
+            entity["internalIpAddress"]["value"] = "127.0.0.1"
+        start = datetime.now() - timedelta(days=1)
+        security.events = [{"timestamp": (start + timedelta(seconds=i)).isoformat(), "priority": int(generator.integers(1, 4))}
+                           for i in range(args.events)]
+        port = security.address.split(":")[1]
+        tm = manager(directory)
+
+        # Full reliability query, TOPSIS and storage writes
+        seconds, requests = measure(lambda: tm.calculate_reliability_scores(orion.address), [orion])
+        record("reliability", scale, seconds, requests)
+
+        # First pull folds every logged event, the following pulls only ask for the events since the cursor
+        seconds, requests = once(lambda: tm.calculate_reputation_scores(orion.address, port), [security])
+        record("reputation_full", scale, seconds, requests)
+        seconds, requests = measure(lambda: tm.calculate_reputation_scores(orion.address, port), [security])
+        record("reputation_incremental", scale, seconds, requests)
+
+        # Trust scores: storage, Orion batch update and IOTA outbox enqueue, then the outbox upload
+        seconds, requests = measure(lambda: tm.update_trust_scores(orion.address, iota.address, "node"), [orion, iota])
+        record("trust_update", scale, seconds, requests)
+        seconds, requests = once(tm.outbox.publish, [iota])
+        record("iota_publish", scale, seconds, requests)
+        tm.storage.close()
+
+    # TOPSIS core on a random decision matrix of the same size
+    matrix = generator.random((scale, len(weights))) * 100
+    criteria = np.full(len(weights), 1 / len(weights))
+    mask = np.array([True, False, True, True, False])
+    seconds, _ = measure(lambda: tm.trust.topsis(matrix, criteria, mask))
+    record("topsis", scale, seconds)
+
+report = {
+    "version": version(),
+    "date": datetime.now().isoformat(),
+    "python": platform.python_version(),
+    "numpy": np.__version__,
+    "platform": platform.platform(),
+    "parameters": {"latency": args.latency, "events": args.events, "repeats": args.repeats},
+    "results": results
+}
+if args.output == "-":
+    print(json.dumps(report, indent=4))
+else:
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=4)
+    print(f"Results written to {args.output}")
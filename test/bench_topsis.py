@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager.algorithm import TrustAlgorithm
+
+# TOPSIS core: previous implementation (per-criterion loop, full-size temporaries) vs vectorized float64 and float32
+alternatives = [10, 100, 1000, 10000, 100000]
+criteria = [5, 10, 50]
+
+def reference_topsis(decision_matrix, weights, impacts):
+    norm_matrix = decision_matrix / np.sqrt((decision_matrix**2).sum(axis=0))
+    weighted_matrix = norm_matrix * weights
+    ideal_solution = np.zeros(weighted_matrix.shape[1])
+    negative_ideal_solution = np.zeros(weighted_matrix.shape[1])
+    for i in range(weighted_matrix.shape[1]):
+        if impacts[i] == '+':
+            ideal_solution[i] = np.max(weighted_matrix[:, i])
+            negative_ideal_solution[i] = np.min(weighted_matrix[:, i])
+        else:
+            ideal_solution[i] = np.min(weighted_matrix[:, i])
+            negative_ideal_solution[i] = np.max(weighted_matrix[:, i])
+    distance_to_ideal = np.sqrt(((weighted_matrix - ideal_solution)**2).sum(axis=1))
+    distance_to_negative_ideal = np.sqrt(((weighted_matrix - negative_ideal_solution)**2).sum(axis=1))
+    relative_closeness = distance_to_negative_ideal / (distance_to_ideal + distance_to_negative_ideal)
+    return np.argsort(-relative_closeness) + 1, relative_closeness
+
+def measure(function, budget=0.5):
+    # Best of as many runs as fit in the time budget (at least 3)
+    best, spent, runs = float("inf"), 0, 0
+    while runs < 3 or spent < budget:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best, spent, runs = min(best, elapsed), spent + elapsed, runs + 1
+    return best * 1000
+
+trust = TrustAlgorithm()
+generator = np.random.default_rng(0)
+print(f"{'alternatives':>12} {'criteria':>8} {'reference':>12} {'float64':>12} {'float32':>12} {'speedup':>8} {'f32 max err':>12}")
+for k in criteria:
+    weights = generator.random(k)
+    weights /= weights.sum()
+    impacts = np.where(generator.random(k) < 0.5, '+', '-')
+    mask = impacts == '+'
+    for n in alternatives:
+        matrix = generator.random((n, k)) * 100
+        _, expected = reference_topsis(matrix, weights, impacts)
+        _, closeness64 = trust.topsis(matrix, weights, mask)
+        _, closeness32 = trust.topsis(matrix, weights, mask, dtype=np.float32)
+        assert np.allclose(expected, closeness64)
+        reference = measure(lambda: reference_topsis(matrix, weights, impacts))
+        float64 = measure(lambda: trust.topsis(matrix, weights, mask))
+        float32 = measure(lambda: trust.topsis(matrix, weights, mask, dtype=np.float32))
+        print(f"{n:>12} {k:>8} {reference:>10.3f}ms {float64:>10.3f}ms {float32:>10.3f}ms {reference / float64:>7.2f}x "
+              f"{np.abs(expected - closeness32).max():>12.2e}")
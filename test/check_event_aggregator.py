@@ -0,0 +1,42 @@
+import os
+import sys
+import math
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager.algorithm import EventAggregator
+
+# Decay and bucket arithmetic of EventAggregator with known timestamps and half-life
+
+weights = {"priority_1": "0.25", "priority_2": "0.35", "priority_3": "0.4"}
+
+# Without decay: weighted mean of priority / 5, each event weighted by its bucket weight
+aggregator = EventAggregator(weights)
+state = aggregator.update(None, [1, 2, 3, 3], 0)
+assert state["counts"] == [1, 1, 2]
+assert math.isclose(state["score"], (0.25 * 0.2 + 0.35 * 0.4 + 2 * 0.4 * 0.6) / (0.25 + 0.35 + 2 * 0.4))
+assert aggregator.update(state, [], 1000)["score"] == state["score"]
+
+# Priorities without a bucket keep their own value and take the weight of the nearest bucket
+assert math.isclose(aggregator.update(None, [5], 0)["score"], 1.0)
+assert math.isclose(aggregator.update(None, [4], 0)["score"], 0.8)
+state = aggregator.update(None, [1, 5], 0)
+assert state["counts"] == [1, 0, 1]
+assert math.isclose(state["score"], (0.25 * 0.2 + 0.4 * 1.0) / (0.25 + 0.4))
+
+# Half-life of 10s: an event 10s old counts half, 20s old a quarter
+aggregator = EventAggregator(weights, half_life=10)
+state = aggregator.update(None, [3], 100)
+state = aggregator.update(state, [1], 110)
+assert [round(count, 12) for count in state["counts"]] == [1, 0, 0.5]
+assert math.isclose(state["score"], (0.25 * 0.2 + 0.5 * 0.4 * 0.6) / (0.25 + 0.5 * 0.4))
+state = aggregator.update(state, [], 120)
+assert [round(count, 12) for count in state["counts"]] == [0.5, 0, 0.25]
+# Decaying every bucket by the same factor leaves the score unchanged until new events arrive
+assert math.isclose(state["score"], (0.25 * 0.2 + 0.5 * 0.4 * 0.6) / (0.25 + 0.5 * 0.4))
+state = aggregator.update(state, [2], 130)
+assert [round(count, 12) for count in state["counts"]] == [0.25, 1, 0.125]
+assert math.isclose(state["score"], (0.25 * 0.25 * 0.2 + 0.35 * 0.4 + 0.125 * 0.4 * 0.6) / (0.25 * 0.25 + 0.35 + 0.125 * 0.4))
+
+# Events older than the state (clock skew) are not decayed backwards
+assert aggregator.update(state, [], 125)["counts"] == state["counts"]
+print("EventAggregator decay and bucket arithmetic OK")
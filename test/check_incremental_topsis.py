@@ -0,0 +1,48 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager.algorithm import TrustAlgorithm, IncrementalTopsis
+
+# IncrementalTopsis against TrustAlgorithm.topsis on the same matrix, after random sequences of inserts, updates and deletes
+
+trust = TrustAlgorithm()
+generator = np.random.default_rng(0)
+weights = {"cpucores": {"impact": "+", "weight": 0.2}, "currentcpuusage": {"impact": "-", "weight": 0.2},
+           "ramcapacity": {"impact": "+", "weight": 0.1}, "availableram": {"impact": "+", "weight": 0.25},
+           "currentramusage": {"impact": "-", "weight": 0.25}}
+weight_values, positive = trust.validate_weights(weights)
+
+def check(engine, expected):
+    keys = list(expected)
+    # Identical alternatives have no closeness (0 / 0) in both engines
+    with np.errstate(invalid="ignore"):
+        _, closeness = trust.topsis(np.array([expected[key] for key in keys]), weight_values, positive)
+        result = engine.closeness()
+    assert sorted(result) == sorted(keys)
+    assert np.allclose([result[key] for key in keys], closeness, equal_nan=True), (result, closeness)
+
+for sequence in range(50):
+    engine = IncrementalTopsis(weights)
+    expected = {}
+    for step in range(generator.integers(50, 300)):
+        action = generator.random()
+        # Small integer values make ties and repeated column extremes frequent
+        values = generator.integers(0, 20, len(weights)).astype(float) if sequence % 2 else generator.random(len(weights)) * 100
+        if action < 0.5 or len(expected) < 2:
+            key = f"ie{step}"
+            engine.add(key, values)
+            expected[key] = values
+        elif action < 0.8:
+            key = list(expected)[generator.integers(len(expected))]
+            engine.update(key, values)
+            expected[key] = values
+        else:
+            key = list(expected)[generator.integers(len(expected))]
+            engine.remove(key)
+            del expected[key]
+        if step % 10 == 0:
+            check(engine, expected)
+    check(engine, expected)
+print("IncrementalTopsis matches topsis on 50 random sequences")
@@ -0,0 +1,43 @@
+import io
+import os
+import sys
+import tempfile
+import itertools
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from trustmanager import LocalStorage, SQLiteStorage
+
+# The same filter conditions against LocalStorage (with and without sorted indexes) and SQLiteStorage, on items whose
+# score fields are missing, non-numeric (strings, None, booleans, NaN) or numeric. Ordered comparisons are only used on
+# `reliability`, which holds numbers only, since Python raises on them for the other values.
+
+items = {
+    "a": {"trust": 0.5, "reliability": 0.2},
+    "b": {"trust": 0.8, "reliability": 0.9},
+    "c": {"trust": "n/a", "reliability": 0.5},
+    "d": {"trust": None, "reliability": 0.7},
+    "e": {"trust": True},
+    "f": {"trust": 1, "reliability": 1},
+    "g": {"trust": float("nan"), "reliability": 0.5},
+    "h": {"reliability": 0.3, "name": "ie"}
+}
+conditions = [{"trust": (op, value)} for op, value in itertools.product(("==", "!="), (0.5, 1, "n/a", None, True))]
+conditions += [{"reliability": (op, value)} for op, value in itertools.product(("==", "!=", ">", "<", ">=", "<="), (0.5, 1))]
+conditions += [{"trust": ("!=", 0.5), "reliability": (">", 0.4)}, {"trust": ("==", 1), "reliability": ("<=", 1)},
+               {"name": ("==", "ie"), "reliability": ("<", 0.5)}, {"name": ("!=", "ie")}]
+
+with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+    storages = [LocalStorage(os.path.join(directory, "plain"), reset=True),
+                LocalStorage(os.path.join(directory, "indexed"), reset=True, indexes=("trust", "reliability")),
+                SQLiteStorage(os.path.join(directory, "scores"), reset=True)]
+    for storage in storages:
+        for key, item in items.items():
+            storage.write_item(item, key)
+    results = [[sorted(storage.filter_items(condition)) for storage in storages] for condition in conditions]
+    for storage in storages:
+        storage.close()
+
+for condition, result in zip(conditions, results):
+    assert result[0] == result[1] == result[2], (condition, result)
+print(f"LocalStorage and SQLiteStorage filters match on {len(conditions)} conditions")
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+import httpx
+
+# Open-loop load generator for the /notification and /health endpoints. It replays the self-security and self-healing
+# samples with Poisson arrivals at the target rate, spread over a population of IEs (one MAC address each). Arrivals do
+# not wait for earlier responses, and latency is measured from the scheduled arrival time, so a slow manager shows up as
+# latency instead of silently lowering the offered rate.
+#
+#   python test/load_generator.py --url http://localhost:3000 --rate 200 --duration 60 --ies 500
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'samples')
+
+parser = argparse.ArgumentParser(description="Trust Manager event load generator")
+parser.add_argument("--url", default="http://localhost:3000", help="Trust Manager base url")
+parser.add_argument("--rate", type=float, default=50, help="target arrival rate in requests per second (both endpoints)")
+parser.add_argument("--duration", type=float, default=30, help="test duration in seconds")
+parser.add_argument("--health-ratio", type=float, default=0.2, help="fraction of the requests sent to /health")
+parser.add_argument("--ies", type=int, default=100, help="number of IEs (MAC addresses) the events are spread over")
+parser.add_argument("--domain", default="MyDomain", help="aerOS domain of the IEs")
+parser.add_argument("--connections", type=int, default=100, help="maximum open connections")
+parser.add_argument("--timeout", type=float, default=10, help="request timeout in seconds")
+parser.add_argument("--seed", type=int, default=0, help="random seed of the arrivals and payloads")
+parser.add_argument("--output", help="also write the report as JSON to this file")
+args = parser.parse_args()
+
+def load(name):
+    with open(os.path.join(SAMPLES, name)) as file:
+        return json.load(file)
+
+# Security notifications are sent as single alerts or as alert lists, health events as event lists or single events
+security_samples = [load("self-sec-alert.json"), load("self-security-alerts.json")]
+health_samples = load("self-healing-alerts.json")
+generator = random.Random(args.seed)
+macs = [":".join(f"{byte:02x}" for byte in [0xfa, 0x16, 0x3e, i >> 16 & 0xff, i >> 8 & 0xff, i & 0xff]) for i in range(args.ies)]
+
+def notification(mac):
+    sample = generator.choice(security_samples)
+    events = sample if isinstance(sample, list) else [sample]
+    node = args.domain + ":" + mac.replace(":", "")
+    body = [dict(event, mac=mac, node_name=node, timestamp=datetime.now().isoformat()) for event in events]
+    return body if isinstance(sample, list) else body[0]
+
+def health(mac):
+    node = args.domain + ":" + mac.replace(":", "")
+    events = [dict(event, mac_address=mac, node_name=node, timestamp=datetime.now().isoformat()) for event in health_samples]
+    return events if generator.random() < 0.5 else generator.choice(events)
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+results = {"/notification": [], "/health": []}
+
+async def send(client, endpoint, body, scheduled):
+    # Latency from the scheduled arrival, status None for transport errors and timeouts
+    try:
+        if endpoint == "/notification":
+            response = await client.put(args.url + endpoint, json=body)
+        else:
+            response = await client.post(args.url + endpoint, json=body)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = None
+    results[endpoint].append((time.perf_counter() - scheduled, status))
+
+async def run():
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        tasks = []
+        start = time.perf_counter()
+        arrival = start
+        while True:
+            arrival += generator.expovariate(args.rate)
+            if arrival - start >= args.duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            mac = generator.choice(macs)
+            if generator.random() < args.health_ratio:
+                tasks.append(asyncio.create_task(send(client, "/health", health(mac), arrival)))
+            else:
+                tasks.append(asyncio.create_task(send(client, "/notification", notification(mac), arrival)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+elapsed = asyncio.run(run())
+
+report = {"parameters": vars(args), "elapsed": elapsed, "endpoints": {}}
+print(f"Offered {args.rate:.1f} req/s for {args.duration:.0f}s over {args.ies} IEs ({elapsed:.1f}s elapsed)")
+print(f"{'endpoint':>14} {'requests':>9} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'2xx':>7} {'4xx':>7} {'5xx':>7} {'failed':>7}")
+for endpoint, samples in results.items():
+    latencies = [latency * 1000 for latency, status in samples if status is not None and status < 400]
+    count = len(samples)
+    rates = {
+        "2xx": sum(1 for _, status in samples if status is not None and status < 400),
+        "4xx": sum(1 for _, status in samples if status is not None and 400 <= status < 500),
+        "5xx": sum(1 for _, status in samples if status is not None and status >= 500),
+        "failed": sum(1 for _, status in samples if status is None)
+    }
+    stats = {
+        "requests": count,
+        "throughput": rates["2xx"] / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "error_rates": {kind: value / count if count else 0 for kind, value in rates.items() if kind != "2xx"}
+    }
+    report["endpoints"][endpoint] = stats
+    latency = ["-" if stats[q] is None else f"{stats[q]:.1f}ms" for q in ("p50", "p95", "p99")]
+    print(f"{endpoint:>14} {count:>9} {stats['throughput']:>8.1f} {latency[0]:>9} {latency[1]:>9} {latency[2]:>9} "
+          + " ".join(f"{value / count if count else 0:>7.1%}" for value in rates.values()))
+
+if args.output:
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=4)
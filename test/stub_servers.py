@@ -0,0 +1,227 @@
+import json
+import time
+import random
+import socket
+import threading
+import urllib.request
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-process stub servers for local testing and benchmarks (no Docker needed)
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=None, headers={}):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, latency=0):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.requests = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+### NGSI-LD Context Broker (InfrastructureElement entities)
+
+def generate_entities(count, domain="MyDomain", seed=0):
+    generator = random.Random(seed)
+    entities = {}
+    for i in range(count):
+        entity_id = f"urn:ngsi-ld:InfrastructureElement:{domain}:{i:012x}"
+        entities[entity_id] = {
+            "id": entity_id,
+            "type": "InfrastructureElement",
+            "internalIpAddress": {"type": "Property", "value": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"},
+            "cpuCores": {"type": "Property", "value": generator.choice([2, 4, 8, 16, 32])},
+            "currentCpuUsage": {"type": "Property", "value": round(generator.uniform(1, 100), 2)},
+            "ramCapacity": {"type": "Property", "value": generator.choice([4096, 8192, 16384, 32768])},
+            "availableRam": {"type": "Property", "value": generator.randint(512, 4096)},
+            "currentRamUsage": {"type": "Property", "value": round(generator.uniform(1, 100), 2)},
+            "trustScore": {"type": "Property", "value": -1},
+            "trustScoreLastUpdate": {"type": "Property", "value": ""},
+        }
+    return entities
+
+class OrionHandler(StubHandler):
+    PREFIX = "/ngsi-ld/v1/entities"
+
+    def do_GET(self):
+        self.delay()
+        self.server.requests += 1
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == self.PREFIX:
+            entities = [entity for entity in self.server.entities.values() if entity["type"] == query.get("type", entity["type"])]
+            offset = int(query.get("offset", 0))
+            limit = min(int(query.get("limit", 20)), 1000)
+            attrs = query["attrs"].split(",") if "attrs" in query else None
+            page = [self.render(entity, attrs, query.get("options") == "keyValues") for entity in entities[offset:offset + limit]]
+            headers = {"NGSILD-Results-Count": len(entities)} if query.get("count") == "true" else {}
+            return self.reply(200, page, headers)
+        entity_id = url.path[len(self.PREFIX) + 1:]
+        if entity_id in self.server.entities:
+            return self.reply(200, self.render(self.server.entities[entity_id], None, query.get("options") == "keyValues"))
+        self.reply(404, {"title": "Entity not found"})
+
+    def do_PATCH(self):
+        self.delay()
+        self.server.requests += 1
+        path = urlsplit(self.path).path
+        entity_id = path[len(self.PREFIX) + 1:-len("/attrs")]
+        if entity_id not in self.server.entities:
+            return self.reply(404, {"title": "Entity not found"})
+        body = self.body()
+        self.server.entities[entity_id].update(body)
+        self.reply(204)
+        self.server.notify([entity_id], body.keys())
+
+    def do_POST(self):
+        self.delay()
+        self.server.requests += 1
+        path = urlsplit(self.path).path
+        if path == "/ngsi-ld/v1/subscriptions":
+            subscription = self.body()
+            subscription_id = subscription.get("id") or f"urn:ngsi-ld:Subscription:{len(self.server.subscriptions) + 1}"
+            self.server.subscriptions[subscription_id] = subscription
+            return self.reply(201, headers={"Location": f"/ngsi-ld/v1/subscriptions/{subscription_id}"})
+        if path != "/ngsi-ld/v1/entityOperations/update":
+            return self.reply(404, {"title": "Not found"})
+        success, errors = [], []
+        updates = self.body()
+        for update in updates:
+            if update["id"] not in self.server.entities:
+                errors.append({"entityId": update["id"], "error": {"type": "https://uri.etsi.org/ngsi-ld/errors/ResourceNotFound", "title": "Entity not found", "status": 404}})
+                continue
+            self.server.entities[update["id"]].update({key: value for key, value in update.items() if key not in ("id", "type")})
+            success.append(update["id"])
+        if errors:
+            self.reply(207, {"success": success, "errors": errors})
+        else:
+            self.reply(204)
+        for update in updates:
+            if update["id"] in success:
+                self.server.notify([update["id"]], update.keys())
+
+    def do_DELETE(self):
+        self.server.requests += 1
+        subscription_id = urlsplit(self.path).path[len("/ngsi-ld/v1/subscriptions/"):]
+        if self.server.subscriptions.pop(subscription_id, None) is None:
+            return self.reply(404, {"title": "Subscription not found"})
+        self.reply(204)
+
+    @staticmethod
+    def render(entity, attrs, key_values):
+        result = {"id": entity["id"], "type": entity["type"]}
+        for key, value in entity.items():
+            if key in ("id", "type") or (attrs is not None and key not in attrs):
+                continue
+            result[key] = value["value"] if key_values else value
+        return result
+
+class StubOrion(StubServer):
+    """
+    NGSI-LD broker emulating the entity listing (attrs, limit, offset, count), entity lookup, attribute PATCH, batch update
+    and subscription endpoints. Changes of watched attributes are notified (key-values) to the subscription endpoints.
+    """
+
+    def __init__(self, count, domain="MyDomain", latency=0):
+        super().__init__(OrionHandler, latency)
+        self.entities = generate_entities(count, domain)
+        self.subscriptions = {}
+        self.notifications = 0
+
+    def notify(self, entity_ids, attributes):
+        for subscription_id, subscription in list(self.subscriptions.items()):
+            if not set(subscription.get("watchedAttributes", attributes)) & set(attributes):
+                continue
+            notification = subscription["notification"]
+            data = [OrionHandler.render(self.entities[entity_id], notification.get("attributes"), notification.get("format") == "keyValues") for entity_id in entity_ids]
+            body = json.dumps({"id": f"urn:ngsi-ld:Notification:{self.notifications}", "type": "Notification", "subscriptionId": subscription_id,
+                               "notifiedAt": datetime.now().isoformat(), "data": data}).encode()
+            self.notifications += 1
+            request = urllib.request.Request(notification["endpoint"]["uri"], data=body, headers={"Content-Type": "application/json"}, method="POST")
+            threading.Thread(target=urllib.request.urlopen, args=(request,), daemon=True).start()
+
+### IOTA API (trust score uploads)
+
+class IotaHandler(StubHandler):
+    def do_POST(self):
+        self.delay()
+        self.server.requests += 1
+        url = urlsplit(self.path)
+        if url.path != "/upload":
+            return self.reply(404, {"error": "Not found"})
+        body = self.body()
+        if self.server.failing:
+            return self.reply(503, {"error": "Unavailable"})
+        self.server.uploads.append({"node": parse_qs(url.query).get("node", [""])[0], **body})
+        self.reply(200, {"status": "ok"})
+
+class StubIota(StubServer):
+    """IOTA API recording the uploaded messages; set `failing` to answer every upload with 503."""
+
+    def __init__(self, latency=0):
+        super().__init__(IotaHandler, latency)
+        self.uploads = []
+        self.failing = False
+
+### Self-security events API (reputation logs)
+
+class SelfSecurityHandler(StubHandler):
+    def do_GET(self):
+        self.delay()
+        self.server.requests += 1
+        url = urlsplit(self.path)
+        if url.path != "/events":
+            return self.reply(404, {"error": "Not found"})
+        since = parse_qs(url.query).get("since", [None])[0]
+        self.reply(200, [event for event in self.server.events if since is None or event["timestamp"] >= since])
+
+class StubSelfSecurity(StubServer):
+    """Self-security API serving the `events` log (`since` returns only the events with the same or a later timestamp)."""
+
+    def __init__(self, latency=0):
+        super().__init__(SelfSecurityHandler, latency)
+        self.events = []
+
+    def log(self, priority):
+        self.events.append({"timestamp": datetime.now().isoformat(), "priority": priority})